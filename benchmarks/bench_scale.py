@@ -0,0 +1,153 @@
+# Measures how a build scales with the size of the archive.
+#
+#   python benchmarks/bench_scale.py [--sizes 1000,10000,100000] [--output FILE] [--compare FILE]
+#
+# Each size gets a synthetic site in a temp directory (see synthetic.py) and
+# runs offline from fixture headlines. Every stage is run once for wall time
+# and bytes written, then again under tracemalloc for peak memory, so the
+# timings don't carry tracemalloc's overhead. Results are written as JSON,
+# by default to benchmarks/results/<commit>.json; --compare prints the
+# change against an earlier results file.
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+import generate
+import synthetic
+
+ARTICLES = 200
+
+def bytes_written():
+    # Bytes passed to write() by this process; Linux only
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def measure(run, setup=None):
+    if setup:
+        setup()
+    before = bytes_written()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        run()
+    wall = time.perf_counter() - start
+    after = bytes_written()
+    if setup:
+        setup()
+    tracemalloc.start()
+    with redirect_stdout(io.StringIO()):
+        run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"wall": wall, "peak_memory": peak,
+            "bytes_written": after - before if before is not None else None}
+
+def bench_size(count):
+    root = tempfile.mkdtemp(prefix=f"bench-{count}-")
+    cwd = os.getcwd()
+    runs = [0]
+    def fresh_site():
+        os.chdir(cwd)
+        shutil.rmtree(root)
+        synthetic.write_site(root, count)
+        os.chdir(root)
+    def fresh_headlines():
+        # New stories every run so the duplicate check doesn't drop them
+        runs[0] += 1
+        with open("headlines.json", "w", encoding="utf-8") as f:
+            json.dump({"articles": synthetic.make_headlines(generate.STORIES_PER_RUN * 10, seed=runs[0])}, f)
+    try:
+        synthetic.write_site(root, count)
+        os.chdir(root)
+        results = {}
+        results["load_archive"] = measure(generate.load_archive)
+        results["load_recent"] = measure(lambda: generate.load_recent(generate.RECENT_SIZE))
+        recent = generate.archive_list(generate.load_recent(generate.RECENT_SIZE))
+        headlines = [h["title"] for h in synthetic.make_headlines(ARTICLES)]
+        results["make_article"] = measure(lambda: [generate.make_article(h) for h in headlines])
+        months = generate.archive_months()
+        results["make_homepage"] = measure(lambda: generate.make_homepage(recent[:generate.PAGE_SIZE], months))
+        entries = synthetic.make_archive(generate.STORIES_PER_RUN, seed=count)
+        sizes = {path: os.path.getsize(path) for path in generate.archive_paths(entries)}
+        def truncate():
+            for path, size in sizes.items():
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        results["save_archive"] = measure(lambda: generate.save_archive(entries), truncate)
+        # Cold builds every page, feed and index from scratch; warm is the
+        # usual hourly run that adds a couple of stories
+        def cold():
+            fresh_site()
+            fresh_headlines()
+        results["main_cold"] = measure(generate.main, cold)
+        results["main_warm"] = measure(generate.main, fresh_headlines)
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+def commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results, path):
+    with open(path, "r") as f:
+        old = json.load(f)
+    print(f"Compared with {old['commit']}:")
+    for size, stages in results["sizes"].items():
+        for stage, now in stages.items():
+            before = old["sizes"].get(size, {}).get(stage)
+            if before and before["wall"]:
+                print(f"  {size:>7} {stage:<14} {now['wall'] / before['wall']:6.2f}x time"
+                      f"  {now['peak_memory'] / max(before['peak_memory'], 1):6.2f}x memory")
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    args = parser.parse_args(argv[1:])
+    # Offline and without optional stages, whatever the environment says
+    generate.API_KEY = ""
+    generate.NEWS_FEEDS = ""
+    generate.NEWS_FIXTURE = "headlines.json"
+    generate.IMAGE_STAGE = False
+    results = {"commit": commit(), "python": platform.python_version(),
+               "date": datetime.now(timezone.utc).isoformat(timespec="seconds"), "sizes": {}}
+    for count in (int(s) for s in args.sizes.split(",")):
+        stages = bench_size(count)
+        results["sizes"][str(count)] = stages
+        for stage, r in stages.items():
+            written = f"{r['bytes_written'] / 1024:10.0f} KiB" if r["bytes_written"] is not None else ""
+            print(f"{count:>7} {stage:<14} {r['wall'] * 1000:10.1f} ms {r['peak_memory'] / 2**20:8.1f} MiB{written}")
+    output = args.output or os.path.join(HERE, "results", f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,291 @@
+# Compares the compiled template engine with the f-string renderer it replaced.
+#
+#   python benchmarks/bench_templates.py [count]
+#
+# The old path is fed the same per-slug seed make_article() uses. The engine
+# now draws its two commentary lines without replacement, so the roast text
+# differs; both must still agree on everything else and on the story's shape
+# before timings are reported.
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate
+
+def legacy_make_article(headline, original_image=None, original_url=None):
+    # Generate Bill Burr-style roasts
+    
+    summary = f"Alright, so here's what happened: {headline.lower()}."
+    
+    # Bill Burr style roasts - angry, brutally honest, hilarious
+    roasts = [
+        f"Oh Jesus Christ, really? {headline.lower()}? This is what we're doing now? THIS is what's important?",
+        f"So let me get this straight - {headline.lower()}. And everybody's acting like this matters. Are you KIDDING me?",
+        f"You gotta be fu- you gotta be kidding me. {headline.lower()}. WHO CARES?!",
+        f"{headline.upper()}! OH MY GOD! Can we just - can we STOP pretending like this is news?",
+        f"Alright, alright, alright. So {headline.lower()}. And I'm supposed to give a shit about this? Really?",
+        f"Here we go again. {headline.lower()}. Another day, another stupid story that doesn't matter.",
+        f"Oh for Christ's sake. {headline.lower()}. This is what passes for journalism now?",
+    ]
+    
+    commentary = [
+        "Look, I'm not saying this isn't A thing. I'm saying it's not a thing WE need to care about. There's a difference!",
+        "And everyone's got an opinion about it. EVERYONE. Like suddenly every moron with a phone is an expert.",
+        "You know what kills me? The fact that we're talking about this instead of literally anything else that matters.",
+        "The media's acting like this is the biggest story of the year. It's Tuesday! It's not even a good Tuesday!",
+        "Here's the thing - and I love this - nobody actually cares. But we're all gonna pretend we do for like, 48 hours.",
+        "And the comments! Oh my God, the COMMENTS. Everyone's got a hot take. Everyone thinks they're right. Nobody knows anything!",
+        "You know what this reminds me of? Remember when we used to care about actual problems? Yeah, me neither.",
+        "I'm watching this unfold and I'm thinking, 'This is it. This is what we've become. THIS is the pinnacle of human civilization.'",
+        "The problem is nobody has anything better to do. So we just sit around caring about stuff that doesn't affect us AT ALL.",
+        "And you know what the worst part is? Tomorrow there'll be something else. Some OTHER stupid thing. It never ends!",
+    ]
+    
+    followup = [
+        "So naturally, the 'experts' came out of the woodwork. Because of COURSE they did.",
+        "People on Twitter are losing their minds. Which, let's be honest, they were gonna do anyway.",
+        "Somebody called for an investigation. AN INVESTIGATION! Into THIS!",
+        "The news is covering this 24/7. TWENTY. FOUR. SEVEN. Like there's nothing else happening in the world.",
+        "And now politicians are weighing in. OH GREAT. Just what we needed - politicians' opinions on this.",
+        "Social media's having a meltdown. Shocking. Absolutely shocking. Said no one.",
+        "They're doing analysis on it. ANALYSIS! They got charts and graphs and everything. For THIS!",
+        "Everyone's demanding answers. Answers to WHAT? What question are we even asking here?",
+    ]
+    
+    rants = [
+        "You know what I love? How we all act surprised. Like 'Oh no, I can't BELIEVE this happened!' Yeah you can. We all can.",
+        "And here's the thing about people - they LOVE being outraged. They're ADDICTED to it. It's like crack for boring people.",
+        "I'm watching all this and I'm thinking, 'We deserve everything that's coming to us. We absolutely deserve it.'",
+        "Nobody's asking the real questions. Like 'Why am I still reading this?' That's a good question. I got nothing for you.",
+        "The level of stupid here is just... *chef's kiss*. It's beautiful, really. In a horrifying way.",
+        "And we wonder why nothing gets done in this country. THIS. This is why. Because we're focused on THIS!",
+        "I'm not even mad anymore. I'm impressed. Impressed that we've reached this level of absurdity and just rolled with it.",
+    ]
+    
+    closer = [
+        "Anyway, that's the news. I'm gonna go drink now. You should too.",
+        "And that's it. That's the story. Congratulations, you're dumber for having read it. You're welcome.",
+        "Alright, I'm done. I can't - I can't talk about this anymore. It's too stupid. I'm out.",
+        "So yeah. That happened. Check back tomorrow when something else stupid happens. Spoiler alert: it will.",
+        "In conclusion: we're all doomed. Not because of this story. Just in general. Have a nice day!",
+        "That's all I got. Now if you'll excuse me, I need to go question my life choices.",
+    ]
+    
+    content = f"<p><strong>{summary}</strong></p>"
+    content += f"<p>{random.choice(roasts)}</p>"
+    content += f"<p>{random.choice(commentary)}</p>"
+    content += f"<p>{random.choice(followup)}</p>"
+    content += f"<p>{random.choice(rants)}</p>"
+    content += f"<p>{random.choice(commentary)}</p>"
+    content += f"<p>{random.choice(closer)}</p>"
+    
+    title = headline.upper() + " - " + random.choice(["EXCLUSIVE", "BREAKING", "DEVELOPING", "SHOCKING", "UNBELIEVABLE"])
+    slug = generate.make_slug(headline) + ".html"
+    date = generate.get_cst_time().strftime("%B %d, %Y at %I:%M %p CST")
+    img = generate.get_image(headline, original_image)
+    
+    # Create source link section
+    source_link = ""
+    if original_url:
+        source_link = f'<p style="background:#f0f0f0;padding:15px;border-radius:8px;margin:20px 0"><strong>📰 Original Story:</strong> <a href="{original_url}" target="_blank" style="color:#c00;text-decoration:underline">Read the actual news article here</a></p>'
+    
+    url = f"https://thedailytab.github.io/The-Daily-Tabloid/articles/{slug}"
+    share_title = headline.replace(' ', '%20')
+    
+    html = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=5.0">
+<title>{title}</title>
+<style>
+*{{margin:0;padding:0;box-sizing:border-box}}
+body{{font-family:Georgia,serif;background:#f5f5f5;margin:0;padding:10px;font-size:16px}}
+nav{{background:#333;padding:10px;margin-bottom:15px;border-radius:8px}}
+nav a{{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}}
+.logo{{color:#c00;font-weight:bold;display:block;margin-bottom:8px}}
+.main{{max-width:800px;margin:0 auto;background:#fff;padding:20px;border-radius:8px}}
+h1{{color:#c00;font-size:1.5em;line-height:1.3;word-wrap:break-word}}
+img{{width:100%;height:auto;margin:15px 0;border-radius:8px;display:block}}
+p{{line-height:1.7;margin:15px 0;font-size:1em;word-wrap:break-word}}
+.share{{margin:30px 0;text-align:center;padding:20px;background:#f9f9f9;border-radius:8px}}
+.share h3{{font-size:1.2em;margin-bottom:15px}}
+.btn{{display:inline-block;padding:10px 16px;margin:5px;background:#1DA1F2;color:#fff;text-decoration:none;border-radius:5px;font-weight:bold;font-size:0.9em}}
+.comments{{margin:30px 0;padding:20px;background:#fff;border-top:3px solid #c00}}
+.comments h2{{font-size:1.3em;margin-bottom:15px}}
+.comment-form input,.comment-form textarea{{width:100%;padding:10px;margin:8px 0;border:1px solid #ddd;border-radius:4px;font-family:Georgia,serif;font-size:1em}}
+.comment-form button{{background:#c00;color:#fff;padding:12px 24px;border:none;border-radius:4px;cursor:pointer;font-weight:bold;width:100%;font-size:1em}}
+.login-prompt{{background:#fff3cd;padding:15px;border-radius:8px;margin-bottom:20px;border-left:4px solid #ffc107}}
+.login-prompt a{{color:#c00;font-weight:bold;text-decoration:underline}}
+.comment{{background:#f9f9f9;padding:15px;margin:15px 0;border-radius:8px;border-left:4px solid #c00}}
+.comment-author{{font-weight:bold;color:#c00;margin-bottom:8px;font-size:1em}}
+.comment-date{{color:#666;font-size:0.85em;margin-bottom:8px}}
+.comment-text{{line-height:1.6;word-wrap:break-word;font-size:0.95em}}
+.no-comments{{text-align:center;color:#666;padding:30px;font-style:italic}}
+@media (min-width: 768px){{
+body{{padding:20px;font-size:18px}}
+nav{{padding:15px}}
+nav a{{font-size:1em;padding:10px 15px}}
+.logo{{display:inline-block;margin-bottom:0}}
+.main{{padding:40px}}
+h1{{font-size:2em}}
+p{{font-size:1.15em}}
+.share h3{{font-size:1.4em}}
+.btn{{padding:12px 24px;font-size:1em}}
+.comment-form button{{width:auto}}
+}}
+</style>
+</head>
+<body>
+<nav>
+<a href="../index.html" class="logo">The Tabloid Times</a>
+<div>
+<a href="../about.html">About</a>
+<a href="../contact.html">Contact</a>
+<a href="../login.html">Login</a>
+<a href="../admin.html">Admin</a>
+</div>
+</nav>
+<div class="main">
+<h1>{title}</h1>
+<p style="color:#666;font-size:0.9em">{date}</p>
+{source_link}
+<img src="{img}" alt="Article Image" onerror="this.src='https://placehold.co/1200x600/FF6B6B/ffffff?text=Image+Unavailable'">
+{content}
+<div class="share">
+<h3>Share This Insanity</h3>
+<a href="https://twitter.com/intent/tweet?text={share_title}&url={url}" class="btn">X</a>
+<a href="https://facebook.com/sharer/sharer.php?u={url}" class="btn" style="background:#1877F2">Facebook</a>
+<a href="https://reddit.com/submit?url={url}&title={share_title}" class="btn" style="background:#FF4500">Reddit</a>
+</div>
+<div class="comments">
+<h2>Comments</h2>
+<div id="loginPrompt" class="login-prompt" style="display:none">
+Please <a href="../login.html">login</a> or <a href="../register.html">create an account</a> to comment.
+</div>
+<div class="comment-form" id="commentForm" style="display:none">
+<textarea id="commentText" placeholder="Share your thoughts..." rows="4" required></textarea>
+<button onclick="postComment()">Post Comment</button>
+</div>
+<div id="commentsList"></div>
+</div>
+<p style="text-align:center;margin-top:30px"><a href="../index.html" style="color:#c00;font-weight:bold;text-decoration:none">← Back</a></p>
+</div>
+<script>
+const ARTICLE_ID = '{slug}';
+const COMMENTS_KEY = 'comments_' + ARTICLE_ID;
+
+function getCurrentUser() {{
+    const user = localStorage.getItem('current_user');
+    return user ? JSON.parse(user) : null;
+}}
+
+function checkLoginStatus() {{
+    const user = getCurrentUser();
+    if (user) {{
+        document.getElementById('loginPrompt').style.display = 'none';
+        document.getElementById('commentForm').style.display = 'block';
+    }} else {{
+        document.getElementById('loginPrompt').style.display = 'block';
+        document.getElementById('commentForm').style.display = 'none';
+    }}
+}}
+
+function loadComments() {{
+    const comments = JSON.parse(localStorage.getItem(COMMENTS_KEY) || '[]');
+    const container = document.getElementById('commentsList');
+    
+    if (comments.length === 0) {{
+        container.innerHTML = '<div class="no-comments">No comments yet. Be the first!</div>';
+        return;
+    }}
+    
+    container.innerHTML = comments.map(c => `
+        <div class="comment">
+            <div class="comment-author">${{c.username}}</div>
+            <div class="comment-date">${{c.date}}</div>
+            <div class="comment-text">${{c.text}}</div>
+        </div>
+    `).join('');
+}}
+
+function postComment() {{
+    const user = getCurrentUser();
+    if (!user) {{
+        alert('Please login to comment');
+        window.location.href = '../login.html';
+        return;
+    }}
+    
+    const text = document.getElementById('commentText').value.trim();
+    if (!text) {{
+        alert('Please enter a comment!');
+        return;
+    }}
+    
+    const comments = JSON.parse(localStorage.getItem(COMMENTS_KEY) || '[]');
+    comments.unshift({{
+        username: user.username,
+        text: text,
+        date: new Date().toLocaleString('en-US', {{timeZone: 'America/Chicago'}})
+    }});
+    
+    localStorage.setItem(COMMENTS_KEY, JSON.stringify(comments));
+    document.getElementById('commentText').value = '';
+    loadComments();
+}}
+
+checkLoginStatus();
+loadComments();
+</script>
+</body>
+</html>"""
+    
+    return {"title": title, "slug": slug, "date": date, "html": html, "image": img}
+
+
+def make_headlines(count):
+    words = ["Mayor", "Cat", "Lottery", "Senate", "Storm", "Quarterback", "Billionaire", "Robot", "Measles", "Festival"]
+    rng = random.Random(42)
+    return [" ".join(rng.choice(words) for _ in range(6)) + f" {i}" for i in range(count)]
+
+def run_legacy(headlines):
+    start = time.perf_counter()
+    pages = []
+    for h in headlines:
+        random.seed(generate.make_slug(h) + ".html")
+        pages.append(legacy_make_article(h, "https://example.com/x.jpg", "https://example.com/story"))
+    return time.perf_counter() - start, pages
+
+def run(headlines):
+    start = time.perf_counter()
+    pages = [generate.make_article(h, "https://example.com/x.jpg", "https://example.com/story") for h in headlines]
+    return time.perf_counter() - start, pages
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 500
+    headlines = make_headlines(count)
+    # Pin the clock so both runs stamp the same date
+    now = generate.get_cst_time()
+    generate.get_cst_time = lambda: now
+    generate.compile_template("article")
+    legacy_time, legacy_pages = run_legacy(headlines)
+    engine_time, engine_pages = run(headlines)
+    fields = ("headline", "date", "url", "image")
+    for legacy, engine in zip(legacy_pages, engine_pages):
+        old, new = generate.parse_article(legacy["html"]), generate.parse_article(engine["html"])
+        if [old[f] for f in fields] != [new[f] for f in fields] or old["content"].count("<p>") != new["content"].count("<p>"):
+            print(f"Story differs for {engine['slug']}")
+            return 1
+    legacy_bytes = sum(len(p["html"].encode("utf-8")) for p in legacy_pages)
+    engine_bytes = sum(len(p["html"].encode("utf-8")) for p in engine_pages)
+    print(f"{count} articles, same story shape")
+    print(f"f-string:  {legacy_time * 1000:8.1f} ms  ({legacy_time / count * 1e6:.1f} us/article)")
+    print(f"templates: {engine_time * 1000:8.1f} ms  ({engine_time / count * 1e6:.1f} us/article)")
+    print(f"page bytes: {legacy_bytes / count:.0f} -> {engine_bytes / count:.0f} per article")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,68 @@
+# Synthetic archives and fixture headlines for offline benchmarking.
+#
+#   python benchmarks/synthetic.py <count> <dir>
+#
+# Writes count stories into <dir>/archive/YYYY-MM.jsonl (plus a manifest saying the
+# articles are current, so a build doesn't first re-render all of them) and
+# <dir>/headlines.json for NEWS_FIXTURE. Same count and seed, same bytes.
+import os
+import sys
+import json
+import random
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate
+
+SUBJECTS = ["Mayor", "Cat", "Senator", "Billionaire", "Robot", "Quarterback", "Goose", "Scientist",
+            "Influencer", "Toddler", "Astronaut", "Chef", "Governor", "Raccoon", "Pop Star", "Judge"]
+VERBS = ["Wins", "Bans", "Sues", "Eats", "Elected To Lead", "Investigates", "Launches", "Rescues",
+         "Declares War On", "Buys", "Forgets", "Discovers", "Apologizes To", "Outruns", "Replaces"]
+OBJECTS = ["Lottery", "Local Bakery", "Budget Bill", "Hurricane", "Moon Base", "School Board",
+           "Traffic Cone", "Football Team", "Crypto Exchange", "Measles Outbreak", "Pancake Festival",
+           "Parking Ticket", "Supreme Court", "Giant Pumpkin", "Streaming Service", "City Council"]
+PLACES = ["In Ohio", "In Texas", "On Mars", "At The Super Bowl", "In Tiny Town", "Downtown",
+          "After Late Night Vote", "Amid Heat Wave", "Despite Protests", "For Third Time"]
+
+def headline(rng, n):
+    # The number keeps slugs unique however many stories are drawn
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(PLACES)} {n}"
+
+def make_entry(rng, n, when):
+    h = headline(rng, n)
+    slug = generate.make_slug(h) + ".html"
+    return {"title": f"{h.upper()} - {rng.choice(generate.TITLE_TAGS)}", "slug": slug,
+            "date": when.strftime("%B %d, %Y at %I:%M %p CST"),
+            "image": f"https://example.com/images/{n}.jpg", "headline": h,
+            "url": f"https://example.com/news/{n}"}
+
+def make_archive(count, seed=0):
+    # Oldest first, one story every half hour up to a fixed date
+    rng = random.Random(seed)
+    start = generate.get_cst_time().replace(year=2026, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return [make_entry(rng, n, start + timedelta(minutes=30 * n)) for n in range(count)]
+
+def make_headlines(count, seed=1):
+    rng = random.Random(seed)
+    return [{"title": headline(rng, f"x{n}"), "image": None, "url": f"https://example.com/fresh/{n}"}
+            for n in range(count)]
+
+def write_site(path, count, seed=0, headlines=20):
+    os.makedirs(os.path.join(path, generate.ARCHIVE_DIR), exist_ok=True)
+    months = {}
+    for entry in make_archive(count, seed):
+        months.setdefault(generate.month_of(entry), {})[entry["slug"]] = entry
+    for month, entries in months.items():
+        generate.write_archive_log(entries, os.path.join(path, generate.partition_path(month)))
+    manifest = {"template": generate.TEMPLATE_VERSION, "outputs": {},
+                "articles": generate.TEMPLATE_VERSION}
+    with open(os.path.join(path, generate.MANIFEST), "w") as f:
+        json.dump(manifest, f)
+    with open(os.path.join(path, "headlines.json"), "w", encoding="utf-8") as f:
+        json.dump({"articles": make_headlines(headlines)}, f)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python benchmarks/synthetic.py <count> <dir>")
+    write_site(sys.argv[2], int(sys.argv[1]))
+    print(f"Wrote {sys.argv[1]} stories to {sys.argv[2]}")
@@ -6,214 +6,976 @@ import re
 import sys
 import random
 import hashlib
+import time
+import threading
+import gzip
+import io
+import struct
+import sqlite3
+import functools
+import traceback
+import contextlib
+import cProfile
+import pstats
+import tracemalloc
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlparse, quote, unquote
+from html import escape as escape_html, unescape as unescape_html
+from email.utils import parsedate_to_datetime
+from xml.sax.saxutils import escape
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 API_KEY = os.environ.get("NEWS_API_KEY", "")
-ARCHIVE = "archive.json"
+NEWS_API_URL = os.environ.get("NEWS_API_URL", "https://newsapi.org/v2/top-headlines")
+# Comma separated; "top" is the plain country=us top headlines
+NEWS_CATEGORIES = os.environ.get("NEWS_CATEGORIES", "top")
+NEWS_FEEDS = os.environ.get("NEWS_FEEDS", "")
+NEWS_FIXTURE = os.environ.get("NEWS_FIXTURE", "")
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", ".cache/http")
+# Seconds a cached payload is reused without asking upstream at all
+HTTP_CACHE_TTL = int(os.environ.get("HTTP_CACHE_TTL", "0"))
+# Download, resize and self-host story images (needs Pillow)
+IMAGE_STAGE = os.environ.get("IMAGE_STAGE", "0") == "1"
+# Serve image URLs from local files instead of the network; see download_image()
+IMAGE_FIXTURE_DIR = os.environ.get("IMAGE_FIXTURE_DIR", "")
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", ".cache/images")
+# SQLite database of the MinHash signatures and LSH buckets of every archived
+# headline, rebuilt from the archive if missing
+DEDUP_INDEX = os.environ.get("DEDUP_INDEX", ".cache/dedup.sqlite3")
+# Write .gz (and .br when brotli is installed) next to every page and asset
+PRECOMPRESS = os.environ.get("PRECOMPRESS", "1") == "1"
+SITE_URL = "https://thedailytab.github.io/The-Daily-Tabloid/"
+# Stories are kept in one append-only log per month, archive/YYYY-MM.jsonl
+ARCHIVE_DIR = "archive"
+LEGACY_LOG = "archive.jsonl"
+# Inverted index from "category/<slug>" and "source/<slug>" to the stories
+# carrying that tag, kept as an append-only log of [key, name, slug, month]
+TAGS_INDEX = f"{ARCHIVE_DIR}/tags.jsonl"
+TAGS_VERSION = 2
+TAG_KINDS = ("category", "source")
+LEGACY_ARCHIVE = "archive.json"
+MANIFEST = ".build-manifest.json"
+# mtime/size/hash of source files for file_fingerprint(); kept out of the
+# committed manifest because every fresh checkout changes the mtimes
+FINGERPRINT_CACHE = ".cache/fingerprints.json"
+# Held for the whole run so overlapping runs on one tree take turns
+LOCK_FILE = ".generate.lock"
+# Present only while a run is changing the archive; see recover_journal()
+JOURNAL = ".build-journal.json"
+ABOUT_CUSTOM = "about_custom.txt"
+# serve mode: seconds between polls (+/- SERVE_JITTER of it), and an optional preview port
+SERVE_INTERVAL = int(os.environ.get("SERVE_INTERVAL", "3600"))
+SERVE_JITTER = float(os.environ.get("SERVE_JITTER", "0.1"))
+SERVE_PORT = int(os.environ.get("SERVE_PORT", "0"))
+# One line of stage timings and counters per run; "" turns it off.
+# METRICS_FORMAT "prom" writes a Prometheus textfile instead (overwritten each run)
+METRICS_FILE = os.environ.get("METRICS_FILE", ".cache/metrics.jsonl")
+METRICS_FORMAT = os.environ.get("METRICS_FORMAT", "jsonl")
+# Comma separated: "cprofile" and/or "tracemalloc"
+PROFILE = os.environ.get("PROFILE", "")
+
+# Bump whenever the page templates change so every page, articles included,
+# gets re-rendered on the next run
+TEMPLATE_VERSION = "12"
+
+# Compact the archive log once it holds this many lines per unique story
+ARCHIVE_COMPACT_RATIO = 2
+
+# Fetching: per-request timeout, retries, and a deadline for all sources together
+FETCH_TIMEOUT = 10
+FETCH_RETRIES = 2
+FETCH_BACKOFF = 0.5
+FETCH_DEADLINE = 30
+FETCH_WORKERS = 8
+HEADLINES_PER_SOURCE = 10
+STORIES_PER_RUN = 2
+
+# Near-duplicate headlines: MinHash over word and word-pair shingles, bucketed
+# with LSH bands so a check only compares against stories sharing a band.
+# 16 bands of 4 rows put the LSH threshold, (1/bands)^(1/rows), near 0.5
+DEDUP_HASHES = 64
+DEDUP_BANDS = 16
+DEDUP_THRESHOLD = 0.5
+DEDUP_VERSION = 4
+
+# Machine-readable feeds: RSS items and api/latest.json items; the JSON feed
+# and sitemap are otherwise split by month
+FEED_SIZE = 20
+API_PAGE_SIZE = 100
+
+# Search index: terms are sharded by their first SEARCH_PREFIX characters and
+# documents are stored SEARCH_BLOCK to a file, so the page only fetches what it needs
+SEARCH_DIR = "search"
+SEARCH_VERSION = 3
+SEARCH_PREFIX = 2
+SEARCH_BLOCK = 256
+SEARCH_MIN_LENGTH = 2
+SEARCH_LIMIT = 50
+
+# Self-hosted image widths: listing thumbnails and the article header
+IMAGES_DIR = "images"
+IMAGE_SIZES = {"thumb": 480, "full": 1200}
+IMAGE_QUALITY = 80
+
+# Stories per page; index.html shows the newest ones and links to each month's
+# archive/YYYY-MM.html, which spills into archive/YYYY-MM-N.html
+PAGE_SIZE = 30
+
+# Stories a normal run loads: enough months back to fill the front page and feeds
+RECENT_SIZE = max(PAGE_SIZE, FEED_SIZE, API_PAGE_SIZE)
 
 def get_cst_time():
     cst = timezone(timedelta(hours=-6))
     return datetime.now(cst)
 
+def month_of(entry):
+    # The partition a story lives in. It is stored on the entry when the
+    # story is archived, so an undated story, filed under the month it was
+    # first seen in, stays there
+    if entry.get("month"):
+        return entry["month"]
+    when = entry_datetime(entry)
+    return when.strftime("%Y-%m") if when else current_month()
+
+def current_month():
+    return get_cst_time().strftime("%Y-%m")
+
+def partition_path(month):
+    return f"{ARCHIVE_DIR}/{month}.jsonl"
+
+def archive_months():
+    # Oldest first
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    return sorted(name[:-len(".jsonl")] for name in os.listdir(ARCHIVE_DIR)
+                  if re.fullmatch(r"\d{4}-\d{2}\.jsonl", name))
+
+def read_archive_log(path):
+    # Append-only log, oldest first; a later line for the same slug replaces
+    # the earlier one and moves it to the newest position, unless it is an
+    # in-place "_update"
+    entries = {}
+    lines = 0
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if not (entry.pop("_update", False) and entry["slug"] in entries):
+                    entries.pop(entry["slug"], None)
+                entries[entry["slug"]] = entry
+                lines += 1
+    return entries, lines
+
+def write_archive_log(entries, path):
+    data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries.values())
+    write_atomic(path, data.encode("utf-8"))
+
+def migrate_archive():
+    # One-time split of the single archive.jsonl log (or the older flat
+    # archive.json list, collapsing duplicate slugs) into monthly partitions
+    if archive_months():
+        return
+    if os.path.exists(LEGACY_LOG):
+        entries, lines = read_archive_log(LEGACY_LOG)
+        source = LEGACY_LOG
+    elif os.path.exists(LEGACY_ARCHIVE):
+        # The list is newest first and the article file holds the newest render
+        with open(LEGACY_ARCHIVE, "r") as f:
+            legacy = json.load(f)
+        entries = {}
+        for entry in reversed(legacy):
+            entries.pop(entry["slug"], None)
+            entries[entry["slug"]] = entry
+        source, lines = LEGACY_ARCHIVE, len(legacy)
+    else:
+        return
+    months = {}
+    for slug, entry in entries.items():
+        entry["month"] = month_of(entry)
+        months.setdefault(entry["month"], {})[slug] = entry
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    for month, part in months.items():
+        write_archive_log(part, partition_path(month))
+    os.remove(source)
+    print(f"Migrated {source}: {lines} entries, {len(entries)} unique, {len(months)} months")
+
+def load_partition(month):
+    path = partition_path(month)
+    entries, lines = read_archive_log(path)
+    if lines > ARCHIVE_COMPACT_RATIO * len(entries):
+        write_archive_log(entries, path)
+    # Stories archived before the month was stored belong where they are
+    for entry in entries.values():
+        entry.setdefault("month", month)
+    return entries
+
 def load_archive():
-    if os.path.exists(ARCHIVE):
-        with open(ARCHIVE, "r") as f:
-            return json.load(f)
-    return []
+    # Every month; a story moved to a later month is dropped from the earlier one
+    migrate_archive()
+    entries = {}
+    for month in archive_months():
+        for slug, entry in load_partition(month).items():
+            entries.pop(slug, None)
+            entries[slug] = entry
+    return entries
+
+def load_recent(count):
+    # The newest months only, enough of them to hold count stories; a
+    # normal run never reads the closed months behind that
+    migrate_archive()
+    parts = []
+    for month in reversed(archive_months()):
+        parts.insert(0, load_partition(month))
+        if sum(len(part) for part in parts) >= count:
+            break
+    entries = {}
+    for part in parts:
+        for slug, entry in part.items():
+            entries.pop(slug, None)
+            entries[slug] = entry
+    return entries
+
+def archive_list(archive):
+    return list(reversed(archive.values()))
+
+def upsert_archive(archive, entries):
+    for entry in entries:
+        archive.pop(entry["slug"], None)
+        archive[entry["slug"]] = entry
+
+def update_archive(archive, entries):
+    # Changes stories without moving them
+    for entry in entries:
+        archive[entry["slug"]] = entry
+
+def archive_paths(entries):
+    return sorted({partition_path(month_of(entry)) for entry in entries})
+
+def save_archive(entries, update=False):
+    # Only the new or changed entries are appended, each to its own month in
+    # one write; a crash mid-append is undone from the journal
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    for path in archive_paths(entries):
+        data = "".join(json.dumps(dict(entry, _update=True) if update else entry, ensure_ascii=False) + "\n"
+                       for entry in entries if partition_path(month_of(entry)) == path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+def acquire_lock():
+    # flock is released by the OS if the process dies, so there is no stale
+    # lock to clean up; without fcntl (Windows) runs are not serialised
+    lock = open(LOCK_FILE, "a")
+    if fcntl:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("Another run holds the lock, waiting")
+            fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
 
-def save_archive(data):
-    with open(ARCHIVE, "w") as f:
-        json.dump(data, f, indent=2)
+def begin_journal(slugs, paths):
+    # Records what the run is about to touch: the length of each archive
+    # partition before the append and the article files it will write
+    journal = {"sizes": {path: os.path.getsize(path) if os.path.exists(path) else 0 for path in paths},
+               "articles": slugs, "archived": False}
+    write_atomic(JOURNAL, json.dumps(journal).encode("utf-8"))
+    return journal
 
-def fetch_news():
-    if not API_KEY:
+def mark_archived(journal):
+    journal["archived"] = True
+    write_atomic(JOURNAL, json.dumps(journal).encode("utf-8"))
+
+def end_journal():
+    if os.path.exists(JOURNAL):
+        os.remove(JOURNAL)
+
+def recover_journal():
+    # A journal left behind means the last run died part way. Before the
+    # archive append finished it is rolled back: the log is cut to its old
+    # length and the run's orphaned articles deleted. After it, the stories
+    # are kept. Either way the manifest, search and tag indexes are dropped so
+    # this run re-checks every page against the archive.
+    if not os.path.exists(JOURNAL):
+        return
+    try:
+        with open(JOURNAL, "r") as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        journal = None
+    if journal and not journal["archived"]:
+        print("Rolling back an interrupted run")
+        kept = {}
+        for path, size in journal["sizes"].items():
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+            kept.update(read_archive_log(path)[0])
+        for slug in journal["articles"]:
+            if slug not in kept:
+                for path in (f"articles/{slug}", f"articles/{slug}.gz", f"articles/{slug}.br"):
+                    if os.path.exists(path):
+                        os.remove(path)
+    else:
+        print("Resuming an interrupted run")
+    for path in (MANIFEST, f"{SEARCH_DIR}/meta.json", TAGS_INDEX):
+        if os.path.exists(path):
+            os.remove(path)
+    end_journal()
+
+def run_locked(command):
+    lock = acquire_lock()
+    try:
+        recover_journal()
+        return command()
+    finally:
+        lock.close()
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_inputs(*parts):
+    return hash_bytes(json.dumps([TEMPLATE_VERSION, *parts], sort_keys=True).encode("utf-8"))
+
+def load_manifest():
+    manifest = {"template": TEMPLATE_VERSION, "outputs": {}}
+    if os.path.exists(MANIFEST):
+        try:
+            with open(MANIFEST, "r") as f:
+                stored = json.load(f)
+            if stored.get("template") == TEMPLATE_VERSION:
+                manifest = stored
+        except (OSError, ValueError):
+            pass
+    manifest.pop("sources", None)
+    try:
+        with open(FINGERPRINT_CACHE, "r") as f:
+            manifest["sources"] = json.load(f)
+    except (OSError, ValueError):
+        manifest["sources"] = {}
+    return manifest
+
+def save_manifest(manifest):
+    stored = {key: value for key, value in manifest.items() if key != "sources"}
+    write_atomic(MANIFEST, json.dumps(stored, indent=2, sort_keys=True).encode("utf-8"))
+    os.makedirs(os.path.dirname(FINGERPRINT_CACHE), exist_ok=True)
+    write_atomic(FINGERPRINT_CACHE, json.dumps(manifest["sources"], sort_keys=True).encode("utf-8"))
+
+def new_report():
+    return {"rebuilt": [], "skipped": [], "deleted": [], "touched": set(),
+            "bytes": {"raw": 0, "minified": 0, "gzip": 0, "brotli": 0}}
+
+def record(report, path, sizes):
+    # sizes is what write_if_changed returned: None when the file was already current
+    report["rebuilt" if sizes else "skipped"].append(path)
+    for kind, size in (sizes or {}).items():
+        report["bytes"][kind] += size
+
+def file_fingerprint(path, manifest):
+    # mtime is the fast path; fresh CI checkouts reset it, so fall back to hashing
+    # the content. Only the hash ends up in page inputs, never the mtime
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    cached = manifest["sources"].get(path)
+    if cached and cached["mtime"] == st.st_mtime and cached["size"] == st.st_size:
+        return cached["hash"]
+    with open(path, "rb") as f:
+        digest = hash_bytes(f.read())
+    manifest["sources"][path] = {"mtime": st.st_mtime, "size": st.st_size, "hash": digest}
+    return digest
+
+def write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def minify_css(css):
+    css = re.sub(r"\s*\n\s*", "", css)
+    return re.sub(r"\s*([{};:,])\s*", r"\1", css)
+
+def minify_js(js):
+    # Line breaks stay so semicolon-less statements still parse
+    return "\n".join(line.strip() for line in js.splitlines() if line.strip())
+
+def minify_html(html):
+    html = re.sub(r"(<style>)(.*?)(</style>)", lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), html, flags=re.S)
+    html = re.sub(r"(<script>)(.*?)(</script>)", lambda m: m.group(1) + minify_js(m.group(2)) + m.group(3), html, flags=re.S)
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip())
+
+MINIFIERS = {".html": minify_html, ".css": minify_css, ".js": minify_js}
+
+def compress_siblings(path, data):
+    sizes = {}
+    if not PRECOMPRESS:
+        return sizes
+    gz = gzip.compress(data, 9, mtime=0)
+    write_atomic(path + ".gz", gz)
+    sizes["gzip"] = len(gz)
+    if brotli:
+        br = brotli.compress(data)
+        write_atomic(path + ".br", br)
+        sizes["brotli"] = len(br)
+    return sizes
+
+def write_if_changed(path, text):
+    # Minify, then write and precompress only if the bytes differ from what is on disk.
+    # Returns the byte sizes written, or None when nothing changed.
+    minify = MINIFIERS.get(os.path.splitext(path)[1])
+    raw = text.encode("utf-8")
+    data = minify(text).encode("utf-8") if minify else raw
+    siblings_ok = not PRECOMPRESS or os.path.exists(path + ".gz")
+    if os.path.exists(path) and siblings_ok:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return None
+    write_atomic(path, data)
+    sizes = {"raw": len(raw), "minified": len(data)}
+    sizes.update(compress_siblings(path, data))
+    return sizes
+
+def build_output(path, make, inputs, manifest, report):
+    # Skip rendering when the inputs are unchanged, and skip writing when the bytes are
+    key = hash_inputs(*inputs)
+    report["touched"].add(path)
+    entry = manifest["outputs"].get(path)
+    if entry and entry["inputs"] == key and os.path.exists(path):
+        report["skipped"].append(path)
+        return False
+    with span("render"):
+        text = make()
+    with span("write"):
+        sizes = write_if_changed(path, text)
+    manifest["outputs"][path] = {"inputs": key}
+    record(report, path, sizes)
+    return bool(sizes)
+
+def prune_outputs(manifest, report):
+    # Outputs from an earlier run that this run no longer produces
+    for path in sorted(set(manifest["outputs"]) - report["touched"]):
+        for stale in (path, path + ".gz", path + ".br"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        del manifest["outputs"][path]
+        report["deleted"].append(path)
+
+def print_report(report):
+    for kind in ("rebuilt", "skipped", "deleted"):
+        paths = report[kind]
+        listed = paths and kind != "skipped"
+        print(f"{kind.capitalize()}: {len(paths)}" + (f" ({', '.join(paths)})" if listed else ""))
+    sizes = report["bytes"]
+    if sizes["raw"]:
+        line = f"Bytes written: {sizes['minified']} minified from {sizes['raw']} (saved {sizes['raw'] - sizes['minified']})"
+        if sizes["gzip"]:
+            line += f", gzip {sizes['gzip']}"
+        if sizes["brotli"]:
+            line += f", brotli {sizes['brotli']}"
+        print(line)
+
+METRICS = {"spans": {}, "counters": {}}
+_metrics_lock = threading.Lock()
+
+def reset_metrics():
+    METRICS["spans"].clear()
+    METRICS["counters"].clear()
+
+@contextlib.contextmanager
+def span(name):
+    # Spans nest (homepage includes its render and write), so they don't add up to the run
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _metrics_lock:
+            total = METRICS["spans"].setdefault(name, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += elapsed
+            total["calls"] += 1
+
+def count(name, n=1):
+    with _metrics_lock:
+        METRICS["counters"][name] = METRICS["counters"].get(name, 0) + n
+
+def count_report(report):
+    for kind in ("rebuilt", "skipped", "deleted"):
+        count(f"outputs_{kind}", len(report[kind]))
+    for kind, size in report["bytes"].items():
+        count(f"bytes_{kind}", size)
+
+def write_metrics(command, seconds):
+    if not METRICS_FILE:
+        return
+    os.makedirs(os.path.dirname(METRICS_FILE) or ".", exist_ok=True)
+    counters = dict(METRICS["counters"], **{f"http_cache_{k}": v for k, v in HTTP_CACHE_STATS.items()})
+    if METRICS_FORMAT == "prom":
+        lines = [f'tabloid_run_seconds{{command="{command}"}} {seconds:.6f}',
+                 f'tabloid_run_timestamp_seconds{{command="{command}"}} {time.time():.0f}']
+        for name, total in sorted(METRICS["spans"].items()):
+            lines.append(f'tabloid_stage_seconds{{command="{command}",stage="{name}"}} {total["seconds"]:.6f}')
+            lines.append(f'tabloid_stage_calls{{command="{command}",stage="{name}"}} {total["calls"]}')
+        for name, value in sorted(counters.items()):
+            lines.append(f'tabloid_{name}{{command="{command}"}} {value}')
+        write_atomic(METRICS_FILE, ("\n".join(lines) + "\n").encode("utf-8"))
+        return
+    line = {"time": datetime.now(timezone.utc).isoformat(timespec="seconds"), "command": command,
+            "seconds": round(seconds, 6),
+            "spans": {k: {"seconds": round(v["seconds"], 6), "calls": v["calls"]} for k, v in METRICS["spans"].items()},
+            "counters": counters}
+    with open(METRICS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(line, sort_keys=True) + "\n")
+
+def instrumented(command, run):
+    # Wraps one run: resets the metrics, runs the optional profilers and
+    # writes the metrics line when it finishes
+    reset_metrics()
+    profilers = {p.strip() for p in PROFILE.split(",") if p.strip()}
+    profiler = cProfile.Profile() if "cprofile" in profilers else None
+    # Left alone when something else (e.g. a benchmark) is already tracing
+    tracing = "tracemalloc" in profilers and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        return run()
+    finally:
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+        if tracing:
+            snapshot = tracemalloc.take_snapshot()
+            count("peak_memory_bytes", tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            print("Top allocations:")
+            for stat in snapshot.statistics("lineno")[:10]:
+                print(f"  {stat}")
+        if profiler:
+            os.makedirs(".cache", exist_ok=True)
+            profiler.dump_stats(f".cache/{command}.pstats")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+        write_metrics(command, seconds)
+        print("Timings: " + ", ".join(f"{k} {v['seconds']:.2f}s" for k, v in METRICS["spans"].items()))
+
+def make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "TabloidTimes/1.0"
+    return session
+
+def get_with_retries(session, url, deadline, params=None, headers=None):
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"deadline passed before {url} responded")
+        try:
+            resp = session.get(url, params=params, headers=headers, timeout=min(FETCH_TIMEOUT, remaining))
+            if resp.status_code >= 500 or resp.status_code == 429:
+                resp.raise_for_status()
+            return resp
+        except requests.RequestException:
+            delay = FETCH_BACKOFF * (2 ** attempt)
+            attempt += 1
+            if attempt > FETCH_RETRIES or time.monotonic() + delay >= deadline:
+                raise
+            time.sleep(delay)
+
+HTTP_CACHE_STATS = {}
+_cache_lock = threading.Lock()
+
+def reset_cache_stats():
+    HTTP_CACHE_STATS.clear()
+    HTTP_CACHE_STATS.update({"hit": 0, "revalidated": 0, "unchanged": 0, "miss": 0})
+
+def count_cache(kind):
+    with _cache_lock:
+        HTTP_CACHE_STATS[kind] += 1
+
+def upstream_unchanged():
+    return sum(HTTP_CACHE_STATS.values()) > 0 and HTTP_CACHE_STATS["miss"] == 0
+
+def cached_get(session, url, deadline, params=None):
+    # Reuse within the TTL, otherwise revalidate with ETag/Last-Modified.
+    # A 200 with the same body still counts as unchanged.
+    request = requests.Request("GET", url, params=params).prepare()
+    key = hash_bytes(request.url.encode("utf-8"))
+    meta_path = os.path.join(HTTP_CACHE_DIR, key + ".json")
+    body_path = os.path.join(HTTP_CACHE_DIR, key + ".body")
+    meta = None
+    if os.path.exists(meta_path) and os.path.exists(body_path):
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+    if meta and time.time() - meta["fetched_at"] < HTTP_CACHE_TTL:
+        count_cache("hit")
+        with open(body_path, "rb") as f:
+            return f.read()
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    resp = get_with_retries(session, url, deadline, params, headers)
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    if resp.status_code == 304 and meta:
+        count_cache("revalidated")
+        meta["fetched_at"] = time.time()
+        write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        with open(body_path, "rb") as f:
+            return f.read()
+    resp.raise_for_status()
+    body = resp.content
+    digest = hash_bytes(body)
+    count_cache("unchanged" if meta and meta.get("hash") == digest else "miss")
+    write_atomic(body_path, body)
+    write_atomic(meta_path, json.dumps({
+        "url": url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+        "hash": digest
+    }).encode("utf-8"))
+    return body
+
+def iso_time(text):
+    # ISO 8601 (NewsAPI, Atom) or RFC 822 (RSS) to ISO 8601, None if neither
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(text).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+def source_name(source):
+    # NewsAPI nests it as {"id", "name"}
+    return source.get("name") if isinstance(source, dict) else source
+
+def fetch_newsapi(session, category, deadline):
+    params = {"country": "us", "apiKey": API_KEY}
+    if category != "top":
+        params["category"] = category
+    data = json.loads(cached_get(session, NEWS_API_URL, deadline, params))
+    articles = []
+    for a in data.get("articles", [])[:HEADLINES_PER_SOURCE]:
+        if a.get("title"):
+            articles.append({
+                "title": a["title"],
+                "image": a.get("urlToImage"),
+                "url": a.get("url"),  # Get original article URL
+                "category": category if category != "top" else None,
+                "source": source_name(a.get("source")),
+                "published": iso_time(a.get("publishedAt"))
+            })
+    return articles
+
+def xml_text(node, *paths):
+    for path in paths:
+        found = node.find(path)
+        if found is not None and found.text and found.text.strip():
+            return found.text.strip()
+    return None
+
+def parse_feed(body):
+    # RSS 2.0 <item> or Atom <entry>
+    atom = "{http://www.w3.org/2005/Atom}"
+    media = "{http://search.yahoo.com/mrss/}"
+    root = ET.fromstring(body)
+    source = xml_text(root, "channel/title", f"{atom}title")
+    articles = []
+    for item in root.iter("item"):
+        image = None
+        for path in ("enclosure", f"{media}content", f"{media}thumbnail"):
+            found = item.find(path)
+            if found is not None and found.get("url"):
+                image = found.get("url")
+                break
+        articles.append({"title": xml_text(item, "title"), "image": image, "url": xml_text(item, "link"),
+                         "category": xml_text(item, "category"), "source": source,
+                         "published": iso_time(xml_text(item, "pubDate"))})
+    for entry in root.iter(f"{atom}entry"):
+        link = entry.find(f"{atom}link")
+        category = entry.find(f"{atom}category")
+        articles.append({
+            "title": xml_text(entry, f"{atom}title"),
+            "image": None,
+            "url": link.get("href") if link is not None else None,
+            "category": category.get("term") if category is not None else None,
+            "source": source,
+            "published": iso_time(xml_text(entry, f"{atom}published", f"{atom}updated"))
+        })
+    return [a for a in articles if a["title"]][:HEADLINES_PER_SOURCE]
+
+def fetch_feed(session, url, deadline):
+    return parse_feed(cached_get(session, url, deadline))
+
+def fetch_fixture(path, deadline):
+    # Local JSON list of {"title", "image", "url", "category", "source",
+    # "published"} for offline runs; NewsAPI's field names work too
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("articles", [])
+    return [{"title": a["title"], "image": a.get("image", a.get("urlToImage")), "url": a.get("url"),
+             "category": a.get("category"), "source": source_name(a.get("source")),
+             "published": iso_time(a.get("published", a.get("publishedAt")))}
+            for a in data if a.get("title")][:HEADLINES_PER_SOURCE]
+
+def news_sources(session, deadline):
+    sources = []
+    if API_KEY:
+        for category in filter(None, (c.strip() for c in NEWS_CATEGORIES.split(","))):
+            sources.append((f"newsapi:{category}", lambda c=category: fetch_newsapi(session, c, deadline)))
+    for url in filter(None, (u.strip() for u in NEWS_FEEDS.split(","))):
+        sources.append((f"feed:{url}", lambda u=url: fetch_feed(session, u, deadline)))
+    if NEWS_FIXTURE:
+        sources.append((f"fixture:{NEWS_FIXTURE}", lambda: fetch_fixture(NEWS_FIXTURE, deadline)))
+    return sources
+
+def merge_headlines(results):
+    # Round-robin across sources so one busy feed can't crowd out the rest
+    seen = set()
+    merged = []
+    for row in range(HEADLINES_PER_SOURCE):
+        for articles in results:
+            if row < len(articles):
+                key = articles[row]["title"].strip().casefold()
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(articles[row])
+    return merged
+
+def fetch_all(session=None):
+    session = session or make_session()
+    deadline = time.monotonic() + FETCH_DEADLINE
+    reset_cache_stats()
+    sources = news_sources(session, deadline)
+    if not sources:
+        return None
+    results = []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        futures = {pool.submit(fetch): name for name, fetch in sources}
+        done, pending = wait(futures, timeout=max(0, deadline - time.monotonic()))
+        for future in futures:
+            name = futures[future]
+            if future in pending:
+                future.cancel()
+                print(f"Source {name} missed the deadline")
+                continue
+            try:
+                results.append(future.result())
+            except (requests.RequestException, OSError, ValueError, ET.ParseError) as e:
+                print(f"Source {name} failed: {e}")
+    return merge_headlines(results)
+
+def fetch_news(session=None):
+    articles = fetch_all(session)
+    if articles is None:
         return [
             {"title": "Cat Elected Mayor", "image": None, "url": None},
             {"title": "Man Wins Lottery", "image": None, "url": None}
         ]
-    try:
-        url = f"https://newsapi.org/v2/top-headlines?country=us&apiKey={API_KEY}"
-        resp = requests.get(url, timeout=10)
-        data = resp.json()
-        if "articles" in data:
-            articles = []
-            for a in data["articles"][:10]:
-                if a.get("title"):
-                    articles.append({
-                        "title": a["title"],
-                        "image": a.get("urlToImage"),
-                        "url": a.get("url")  # Get original article URL
-                    })
-            if len(articles) >= 2:
-                return random.sample(articles, 2)
-            return articles[:2]
-    except:
-        pass
+    if articles:
+        # Shuffled rather than cut down here so duplicates can be replaced
+        # by the next candidate; see dedupe_headlines()
+        random.shuffle(articles)
+        return articles
     return [
         {"title": "Breaking News", "image": None, "url": None},
         {"title": "Story Develops", "image": None, "url": None}
     ]
 
-def make_slug(text):
-    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:50]
+def image_format():
+    # WebP when this Pillow build can write it, JPEG otherwise
+    Image.init()
+    return ("webp", "WEBP") if "WEBP" in Image.SAVE else ("jpg", "JPEG")
 
-def get_image(headline, original_image=None):
-    # Use original article image if available
-    if original_image:
-        return original_image
-    
-    # Fallback: Use site logo
-    return "https://via.placeholder.com/1200x600/c00/ffffff?text=The+Tabloid+Times"
+def load_image_index():
+    path = os.path.join(IMAGE_CACHE_DIR, "index.json")
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {"urls": {}, "derived": {}}
 
-def make_article(headline, original_image=None, original_url=None):
-    # Generate Bill Burr-style roasts
-    
-    summary = f"Alright, so here's what happened: {headline.lower()}."
-    
-    # Bill Burr style roasts - angry, brutally honest, hilarious
-    roasts = [
-        f"Oh Jesus Christ, really? {headline.lower()}? This is what we're doing now? THIS is what's important?",
-        f"So let me get this straight - {headline.lower()}. And everybody's acting like this matters. Are you KIDDING me?",
-        f"You gotta be fu- you gotta be kidding me. {headline.lower()}. WHO CARES?!",
-        f"{headline.upper()}! OH MY GOD! Can we just - can we STOP pretending like this is news?",
-        f"Alright, alright, alright. So {headline.lower()}. And I'm supposed to give a shit about this? Really?",
-        f"Here we go again. {headline.lower()}. Another day, another stupid story that doesn't matter.",
-        f"Oh for Christ's sake. {headline.lower()}. This is what passes for journalism now?",
-    ]
-    
-    commentary = [
-        "Look, I'm not saying this isn't A thing. I'm saying it's not a thing WE need to care about. There's a difference!",
-        "And everyone's got an opinion about it. EVERYONE. Like suddenly every moron with a phone is an expert.",
-        "You know what kills me? The fact that we're talking about this instead of literally anything else that matters.",
-        "The media's acting like this is the biggest story of the year. It's Tuesday! It's not even a good Tuesday!",
-        "Here's the thing - and I love this - nobody actually cares. But we're all gonna pretend we do for like, 48 hours.",
-        "And the comments! Oh my God, the COMMENTS. Everyone's got a hot take. Everyone thinks they're right. Nobody knows anything!",
-        "You know what this reminds me of? Remember when we used to care about actual problems? Yeah, me neither.",
-        "I'm watching this unfold and I'm thinking, 'This is it. This is what we've become. THIS is the pinnacle of human civilization.'",
-        "The problem is nobody has anything better to do. So we just sit around caring about stuff that doesn't affect us AT ALL.",
-        "And you know what the worst part is? Tomorrow there'll be something else. Some OTHER stupid thing. It never ends!",
-    ]
-    
-    followup = [
-        "So naturally, the 'experts' came out of the woodwork. Because of COURSE they did.",
-        "People on Twitter are losing their minds. Which, let's be honest, they were gonna do anyway.",
-        "Somebody called for an investigation. AN INVESTIGATION! Into THIS!",
-        "The news is covering this 24/7. TWENTY. FOUR. SEVEN. Like there's nothing else happening in the world.",
-        "And now politicians are weighing in. OH GREAT. Just what we needed - politicians' opinions on this.",
-        "Social media's having a meltdown. Shocking. Absolutely shocking. Said no one.",
-        "They're doing analysis on it. ANALYSIS! They got charts and graphs and everything. For THIS!",
-        "Everyone's demanding answers. Answers to WHAT? What question are we even asking here?",
-    ]
-    
-    rants = [
-        "You know what I love? How we all act surprised. Like 'Oh no, I can't BELIEVE this happened!' Yeah you can. We all can.",
-        "And here's the thing about people - they LOVE being outraged. They're ADDICTED to it. It's like crack for boring people.",
-        "I'm watching all this and I'm thinking, 'We deserve everything that's coming to us. We absolutely deserve it.'",
-        "Nobody's asking the real questions. Like 'Why am I still reading this?' That's a good question. I got nothing for you.",
-        "The level of stupid here is just... *chef's kiss*. It's beautiful, really. In a horrifying way.",
-        "And we wonder why nothing gets done in this country. THIS. This is why. Because we're focused on THIS!",
-        "I'm not even mad anymore. I'm impressed. Impressed that we've reached this level of absurdity and just rolled with it.",
-    ]
-    
-    closer = [
-        "Anyway, that's the news. I'm gonna go drink now. You should too.",
-        "And that's it. That's the story. Congratulations, you're dumber for having read it. You're welcome.",
-        "Alright, I'm done. I can't - I can't talk about this anymore. It's too stupid. I'm out.",
-        "So yeah. That happened. Check back tomorrow when something else stupid happens. Spoiler alert: it will.",
-        "In conclusion: we're all doomed. Not because of this story. Just in general. Have a nice day!",
-        "That's all I got. Now if you'll excuse me, I need to go question my life choices.",
-    ]
-    
-    content = f"<p><strong>{summary}</strong></p>"
-    content += f"<p>{random.choice(roasts)}</p>"
-    content += f"<p>{random.choice(commentary)}</p>"
-    content += f"<p>{random.choice(followup)}</p>"
-    content += f"<p>{random.choice(rants)}</p>"
-    content += f"<p>{random.choice(commentary)}</p>"
-    content += f"<p>{random.choice(closer)}</p>"
-    
-    title = headline.upper() + " - " + random.choice(["EXCLUSIVE", "BREAKING", "DEVELOPING", "SHOCKING", "UNBELIEVABLE"])
-    slug = make_slug(headline) + ".html"
-    date = get_cst_time().strftime("%B %d, %Y at %I:%M %p CST")
-    img = get_image(headline, original_image)
-    
-    # Create source link section
-    source_link = ""
-    if original_url:
-        source_link = f'<p style="background:#f0f0f0;padding:15px;border-radius:8px;margin:20px 0"><strong>📰 Original Story:</strong> <a href="{original_url}" target="_blank" style="color:#c00;text-decoration:underline">Read the actual news article here</a></p>'
-    
-    url = f"https://thedailytab.github.io/The-Daily-Tabloid/articles/{slug}"
-    share_title = headline.replace(' ', '%20')
-    
-    html = f"""<!DOCTYPE html>
+def save_image_index(index):
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    write_atomic(os.path.join(IMAGE_CACHE_DIR, "index.json"), json.dumps(index, sort_keys=True).encode("utf-8"))
+
+def download_image(session, url, deadline):
+    if IMAGE_FIXTURE_DIR:
+        # Fixtures are named after the URL's hash, or failing that its last path segment
+        path = os.path.join(IMAGE_FIXTURE_DIR, hash_bytes(url.encode("utf-8"))[:16])
+        if not os.path.exists(path):
+            path = os.path.join(IMAGE_FIXTURE_DIR, os.path.basename(urlparse(url).path))
+        with open(path, "rb") as f:
+            return f.read()
+    resp = get_with_retries(session, url, deadline)
+    resp.raise_for_status()
+    return resp.content
+
+def cache_image(session, url, index, deadline):
+    # Originals are stored by content hash, so a URL is only downloaded once
+    # and two URLs serving the same picture share one set of resized files
+    digest = index["urls"].get(url)
+    if digest and os.path.exists(os.path.join(IMAGE_CACHE_DIR, digest)):
+        return digest
+    data = download_image(session, url, deadline)
+    digest = hash_bytes(data)
+    write_atomic(os.path.join(IMAGE_CACHE_DIR, digest), data)
+    return digest
+
+def resize_image(digest):
+    ext, fmt = image_format()
+    with Image.open(os.path.join(IMAGE_CACHE_DIR, digest)) as source:
+        source.load()
+        source = source.convert("RGB")
+    derived = {}
+    for name, width in IMAGE_SIZES.items():
+        # Never upscale; a size the source can't fill reuses the smaller file
+        width = min(width, source.width)
+        same = [d for d in derived.values() if d["width"] == width]
+        if same:
+            derived[name] = same[0]
+            continue
+        img = source
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        path = f"{IMAGES_DIR}/{digest[:16]}-{width}.{ext}"
+        buf = io.BytesIO()
+        img.save(buf, fmt, quality=IMAGE_QUALITY)
+        write_atomic(path, buf.getvalue())
+        derived[name] = {"src": path, "width": img.width, "height": img.height}
+    return derived
+
+def process_image(session, url, index, deadline):
+    digest = cache_image(session, url, index, deadline)
+    derived = index["derived"].get(digest)
+    if not derived or not all(os.path.exists(d["src"]) for d in derived.values()):
+        derived = resize_image(digest)
+    return digest, derived
+
+def process_images(urls, session=None):
+    # Returns {url: {"thumb": {...}, "full": {...}}} for the images that worked
+    urls = sorted({u for u in urls if u and u.startswith(("http://", "https://"))})
+    if not IMAGE_STAGE or Image is None or not urls:
+        return {}
+    session = session or make_session()
+    deadline = time.monotonic() + FETCH_DEADLINE
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+    index = load_image_index()
+    results = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        futures = {pool.submit(process_image, session, url, index, deadline): url for url in urls}
+        for future in futures:
+            url = futures[future]
+            try:
+                digest, derived = future.result()
+            except (requests.RequestException, OSError, ValueError, Image.DecompressionBombError) as e:
+                failed.append(f"{url}: {e}")
+                continue
+            index["urls"][url] = digest
+            index["derived"][digest] = derived
+            results[url] = derived
+    save_image_index(index)
+    print(f"Images: {len(results)} of {len(urls)} ready" + (f", {len(failed)} skipped (first: {failed[0]})" if failed else ""))
+    return results
+
+def image_attrs(images, prefix, lazy):
+    # Extra <img> attributes; the src itself is picked by the caller
+    attrs = ""
+    if images:
+        thumb, full = images["thumb"], images["full"]
+        size = thumb if lazy else full
+        # One candidate per width; a narrow source yields a single one
+        widths = {d["width"]: d["src"] for d in (full, thumb)}
+        srcset = ", ".join(f"{prefix}{src} {width}w" for width, src in sorted(widths.items()))
+        attrs += (f' srcset="{srcset}"'
+                  f' sizes="(min-width: 768px) 960px, 100vw" width="{size["width"]}" height="{size["height"]}"')
+    return attrs + (' loading="lazy"' if lazy else ' decoding="async"')
+
+# Templates use {{ name }} for values and {{> name }} for partials. Each one is
+# compiled once, with partials inlined, into a cached list of literal chunks.
+PARTIALS = {
+    "head": """<!DOCTYPE html>
 <html>
 <head>
 <meta charset="UTF-8">
 <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=5.0">
-<title>{title}</title>
-<style>
-*{{margin:0;padding:0;box-sizing:border-box}}
-body{{font-family:Georgia,serif;background:#f5f5f5;margin:0;padding:10px;font-size:16px}}
-nav{{background:#333;padding:10px;margin-bottom:15px;border-radius:8px}}
-nav a{{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}}
-.logo{{color:#c00;font-weight:bold;display:block;margin-bottom:8px}}
-.main{{max-width:800px;margin:0 auto;background:#fff;padding:20px;border-radius:8px}}
-h1{{color:#c00;font-size:1.5em;line-height:1.3;word-wrap:break-word}}
-img{{width:100%;height:auto;margin:15px 0;border-radius:8px;display:block}}
-p{{line-height:1.7;margin:15px 0;font-size:1em;word-wrap:break-word}}
-.share{{margin:30px 0;text-align:center;padding:20px;background:#f9f9f9;border-radius:8px}}
-.share h3{{font-size:1.2em;margin-bottom:15px}}
-.btn{{display:inline-block;padding:10px 16px;margin:5px;background:#1DA1F2;color:#fff;text-decoration:none;border-radius:5px;font-weight:bold;font-size:0.9em}}
-.comments{{margin:30px 0;padding:20px;background:#fff;border-top:3px solid #c00}}
-.comments h2{{font-size:1.3em;margin-bottom:15px}}
-.comment-form input,.comment-form textarea{{width:100%;padding:10px;margin:8px 0;border:1px solid #ddd;border-radius:4px;font-family:Georgia,serif;font-size:1em}}
-.comment-form button{{background:#c00;color:#fff;padding:12px 24px;border:none;border-radius:4px;cursor:pointer;font-weight:bold;width:100%;font-size:1em}}
-.login-prompt{{background:#fff3cd;padding:15px;border-radius:8px;margin-bottom:20px;border-left:4px solid #ffc107}}
-.login-prompt a{{color:#c00;font-weight:bold;text-decoration:underline}}
-.comment{{background:#f9f9f9;padding:15px;margin:15px 0;border-radius:8px;border-left:4px solid #c00}}
-.comment-author{{font-weight:bold;color:#c00;margin-bottom:8px;font-size:1em}}
-.comment-date{{color:#666;font-size:0.85em;margin-bottom:8px}}
-.comment-text{{line-height:1.6;word-wrap:break-word;font-size:0.95em}}
-.no-comments{{text-align:center;color:#666;padding:30px;font-style:italic}}
-@media (min-width: 768px){{
-body{{padding:20px;font-size:18px}}
-nav{{padding:15px}}
-nav a{{font-size:1em;padding:10px 15px}}
-.logo{{display:inline-block;margin-bottom:0}}
-.main{{padding:40px}}
-h1{{font-size:2em}}
-p{{font-size:1.15em}}
-.share h3{{font-size:1.4em}}
-.btn{{padding:12px 24px;font-size:1em}}
-.comment-form button{{width:auto}}
-}}
-</style>
-</head>
-<body>
+<title>{{ title }}</title>
+""",
+    "logo": """<a href="{{ prefix }}index.html" class="logo">The Tabloid Times</a>
+""",
+    "nav_links": """<a href="{{ prefix }}about.html">About</a>
+<a href="{{ prefix }}contact.html">Contact</a>
+<a href="{{ prefix }}login.html">Login</a>
+<a href="{{ prefix }}admin.html">Admin</a>
+<a href="{{ prefix }}search.html">Search</a>
+""",
+    "nav": """<nav>
+{{> logo }}{{> nav_links }}</nav>
+""",
+    "footer": """<footer>
+<p>All stories are AI generated satire.</p>
+<p>&copy; 2026 The Tabloid Times</p>
+</footer>
+""",
+}
+
+TEMPLATES = {
+    "article": """{{> head }}{{> article_style }}</head>
+<body class="pg-article">
 <nav>
-<a href="../index.html" class="logo">The Tabloid Times</a>
-<div>
-<a href="../about.html">About</a>
-<a href="../contact.html">Contact</a>
-<a href="../login.html">Login</a>
-<a href="../admin.html">Admin</a>
-</div>
+{{> logo }}<div>
+{{> nav_links }}</div>
 </nav>
 <div class="main">
-<h1>{title}</h1>
-<p style="color:#666;font-size:0.9em">{date}</p>
-{source_link}
-<img src="{img}" alt="Article Image" onerror="this.src='https://placehold.co/1200x600/FF6B6B/ffffff?text=Image+Unavailable'">
-{content}
+<h1>{{ title }}</h1>
+<p style="color:#666;font-size:0.9em">{{ date }}</p>
+{{ source_link }}
+<img src="{{ img }}" alt="Article Image"{{ img_attrs }} onerror="this.src='https://placehold.co/1200x600/FF6B6B/ffffff?text=Image+Unavailable'">
+{{ content }}
 <div class="share">
 <h3>Share This Insanity</h3>
-<a href="https://twitter.com/intent/tweet?text={share_title}&url={url}" class="btn">X</a>
-<a href="https://facebook.com/sharer/sharer.php?u={url}" class="btn" style="background:#1877F2">Facebook</a>
-<a href="https://reddit.com/submit?url={url}&title={share_title}" class="btn" style="background:#FF4500">Reddit</a>
+<a href="https://twitter.com/intent/tweet?text={{ share_title }}&url={{ url }}" class="btn">X</a>
+<a href="https://facebook.com/sharer/sharer.php?u={{ url }}" class="btn" style="background:#1877F2">Facebook</a>
+<a href="https://reddit.com/submit?url={{ url }}&title={{ share_title }}" class="btn" style="background:#FF4500">Reddit</a>
 </div>
 <div class="comments">
 <h2>Comments</h2>
 <div id="loginPrompt" class="login-prompt" style="display:none">
-Please <a href="../login.html">login</a> or <a href="../register.html">create an account</a> to comment.
+Please <a href="{{ prefix }}login.html">login</a> or <a href="{{ prefix }}register.html">create an account</a> to comment.
 </div>
 <div class="comment-form" id="commentForm" style="display:none">
 <textarea id="commentText" placeholder="Share your thoughts..." rows="4" required></textarea>
@@ -221,259 +983,837 @@ Please <a href="../login.html">login</a> or <a href="../register.html">create an
 </div>
 <div id="commentsList"></div>
 </div>
-<p style="text-align:center;margin-top:30px"><a href="../index.html" style="color:#c00;font-weight:bold;text-decoration:none">← Back</a></p>
+<p style="text-align:center;margin-top:30px"><a href="{{ prefix }}index.html" style="color:#c00;font-weight:bold;text-decoration:none">← Back</a></p>
+</div>
+<script>
+const ARTICLE_ID = '{{ slug }}';
+</script>
+<script src="{{ prefix }}{{> comments_js }}"></script>
+</body>
+</html>""",
+    "story": """<div class="story"><a href="{{ prefix }}articles/{{ slug }}"><img src="{{ img }}"{{ img_attrs }} onerror="this.src='https://placehold.co/800x400/FF6B6B/ffffff?text=NEWS'"></a><h2><a href="{{ prefix }}articles/{{ slug }}">{{ title }}</a></h2><p>{{ date }}</p></div>""",
+    "listing": """{{> head }}{{> listing_style }}</head>
+<body class="pg-listing">
+{{> nav }}<header>
+<h1>The Tabloid Times</h1>
+<p class="tagline">SHOCKING NEWS - EXCLUSIVE STORIES</p>
+</header>
+<div class="main">
+{{ updated }}{{ items }}{{ pager }}{{ sections }}
+</div>
+{{> footer }}</body>
+</html>""",
+    "search": """{{> head }}{{> listing_style }}</head>
+<body class="pg-listing">
+{{> nav }}<header>
+<h1>The Tabloid Times</h1>
+<p class="tagline">SEARCH THE ARCHIVE</p>
+</header>
+<div class="main">
+<form class="search" id="searchForm">
+<input id="q" type="search" placeholder="Search stories..." autofocus>
+<button type="submit">Search</button>
+</form>
+<p class="updated" id="status"></p>
+<div id="results"></div>
+</div>
+{{> footer }}<script>
+const SEARCH = {{ config }};
+const shards = {};
+const blocks = {};
+
+function tokenize(text) {
+    return (text.toLowerCase().match(/[\\p{L}\\p{N}]+/gu) || [])
+        .filter(t => t.length >= SEARCH.min && !SEARCH.stop.includes(t));
+}
+
+function shardKey(term) {
+    return Array.from(term.slice(0, SEARCH.prefix)).map(c => /[a-z0-9]/.test(c) ? c : '_').join('');
+}
+
+async function getJSON(cache, key, url) {
+    if (!(key in cache)) {
+        cache[key] = fetch(url).then(r => r.ok ? r.json() : null).catch(() => null);
+    }
+    return cache[key];
+}
+
+async function lookup(term) {
+    // Prefix match, so a half-typed word still finds stories
+    const shard = await getJSON(shards, shardKey(term), `search/terms/${shardKey(term)}.json`) || {};
+    const ids = new Set();
+    for (const [t, postings] of Object.entries(shard)) {
+        if (t.startsWith(term)) postings.forEach(id => ids.add(id));
+    }
+    return ids;
+}
+
+async function search(query) {
+    const terms = tokenize(query);
+    const status = document.getElementById('status');
+    const results = document.getElementById('results');
+    results.innerHTML = '';
+    if (!terms.length) {
+        status.textContent = '';
+        return;
+    }
+    let ids = null;
+    for (const set of await Promise.all(terms.map(lookup))) {
+        ids = ids === null ? set : new Set([...ids].filter(id => set.has(id)));
+    }
+    const hits = [];
+    for (const id of [...ids].sort((a, b) => b - a).slice(0, SEARCH.limit)) {
+        const block = await getJSON(blocks, Math.floor(id / SEARCH.block), `search/docs/${Math.floor(id / SEARCH.block)}.json`);
+        const doc = block && block[id % SEARCH.block];
+        if (doc) hits.push(doc);
+    }
+    status.textContent = hits.length ? `${hits.length} stories found` : 'No stories found.';
+    // Titles come from upstream feeds, so they are set as text, never as markup
+    for (const [slug, title, date] of hits) {
+        const story = document.createElement('div');
+        story.className = 'story';
+        const heading = document.createElement('h2');
+        const link = document.createElement('a');
+        link.href = 'articles/' + encodeURIComponent(slug);
+        link.textContent = title;
+        heading.appendChild(link);
+        const when = document.createElement('p');
+        when.textContent = date;
+        story.append(heading, when);
+        results.appendChild(story);
+    }
+}
+
+document.getElementById('searchForm').onsubmit = function(ev) {
+    ev.preventDefault();
+    const q = document.getElementById('q').value;
+    history.replaceState(null, '', '?q=' + encodeURIComponent(q));
+    search(q);
+};
+
+const initial = new URLSearchParams(location.search).get('q');
+if (initial) {
+    document.getElementById('q').value = initial;
+    search(initial);
+}
+</script>
+</body>
+</html>""",
+    "about": """{{> head }}{{> about_style }}</head>
+<body class="pg-about">
+{{> nav }}<div class="main">
+<h1>About The Tabloid Times</h1>
+{{ custom_content }}
+</div>
+</body>
+</html>""",
+    "contact": """{{> head }}{{> contact_style }}</head>
+<body class="pg-contact">
+{{> nav }}<div class="main">
+<h1>Contact Us</h1>
+<div id="msg" class="success">Message sent!</div>
+<form id="f">
+<input id="n" placeholder="Name" required>
+<input id="e" type="email" placeholder="Email" required>
+<textarea id="m" placeholder="Message" required></textarea>
+<button type="submit">Send Message</button>
+</form>
 </div>
 <script>
-const ARTICLE_ID = '{slug}';
-const COMMENTS_KEY = 'comments_' + ARTICLE_ID;
+document.getElementById('f').onsubmit=function(ev){
+ev.preventDefault();
+var msgs=JSON.parse(localStorage.getItem('tabloid_messages')||'[]');
+msgs.unshift({id:Date.now(),name:document.getElementById('n').value,email:document.getElementById('e').value,message:document.getElementById('m').value,date:new Date().toLocaleString()});
+localStorage.setItem('tabloid_messages',JSON.stringify(msgs));
+document.getElementById('msg').style.display='block';
+this.reset();
+setTimeout(function(){document.getElementById('msg').style.display='none'},3000)
+};
+</script>
+</body>
+</html>""",
+}
+
+# Page stylesheets, one rule per line. Rules for the page shell stay inline;
+# the rest are scoped by body class and shipped in one fingerprinted site.css.
+STYLES = {
+    "article": """*{margin:0;padding:0;box-sizing:border-box}
+body{font-family:Georgia,serif;background:#f5f5f5;margin:0;padding:10px;font-size:16px}
+nav{background:#333;padding:10px;margin-bottom:15px;border-radius:8px}
+nav a{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}
+.logo{color:#c00;font-weight:bold;display:block;margin-bottom:8px}
+.main{max-width:800px;margin:0 auto;background:#fff;padding:20px;border-radius:8px}
+h1{color:#c00;font-size:1.5em;line-height:1.3;word-wrap:break-word}
+img{width:100%;height:auto;margin:15px 0;border-radius:8px;display:block}
+p{line-height:1.7;margin:15px 0;font-size:1em;word-wrap:break-word}
+.share{margin:30px 0;text-align:center;padding:20px;background:#f9f9f9;border-radius:8px}
+.share h3{font-size:1.2em;margin-bottom:15px}
+.btn{display:inline-block;padding:10px 16px;margin:5px;background:#1DA1F2;color:#fff;text-decoration:none;border-radius:5px;font-weight:bold;font-size:0.9em}
+.comments{margin:30px 0;padding:20px;background:#fff;border-top:3px solid #c00}
+.comments h2{font-size:1.3em;margin-bottom:15px}
+.comment-form input,.comment-form textarea{width:100%;padding:10px;margin:8px 0;border:1px solid #ddd;border-radius:4px;font-family:Georgia,serif;font-size:1em}
+.comment-form button{background:#c00;color:#fff;padding:12px 24px;border:none;border-radius:4px;cursor:pointer;font-weight:bold;width:100%;font-size:1em}
+.login-prompt{background:#fff3cd;padding:15px;border-radius:8px;margin-bottom:20px;border-left:4px solid #ffc107}
+.login-prompt a{color:#c00;font-weight:bold;text-decoration:underline}
+.comment{background:#f9f9f9;padding:15px;margin:15px 0;border-radius:8px;border-left:4px solid #c00}
+.comment-author{font-weight:bold;color:#c00;margin-bottom:8px;font-size:1em}
+.comment-date{color:#666;font-size:0.85em;margin-bottom:8px}
+.comment-text{line-height:1.6;word-wrap:break-word;font-size:0.95em}
+.no-comments{text-align:center;color:#666;padding:30px;font-style:italic}
+@media (min-width: 768px){
+body{padding:20px;font-size:18px}
+nav{padding:15px}
+nav a{font-size:1em;padding:10px 15px}
+.logo{display:inline-block;margin-bottom:0}
+.main{padding:40px}
+h1{font-size:2em}
+p{font-size:1.15em}
+.share h3{font-size:1.4em}
+.btn{padding:12px 24px;font-size:1em}
+.comment-form button{width:auto}
+}
+""",
+    "listing": """*{margin:0;padding:0;box-sizing:border-box}
+body{font-family:Georgia,serif;background:#f5f5f5;margin:0;font-size:16px}
+nav{background:#333;padding:10px}
+nav a{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}
+.logo{color:#c00;font-weight:bold;display:block;margin-bottom:8px}
+header{background:#c00;color:#fff;padding:30px 15px;text-align:center}
+h1{font-size:2em;text-transform:uppercase;word-wrap:break-word}
+.tagline{font-size:1em;margin-top:8px}
+.main{max-width:1000px;margin:0 auto;padding:15px}
+.updated{text-align:center;color:#666;margin-bottom:20px;font-size:0.9em}
+.story{background:#fff;margin:15px 0;padding:15px;border-radius:8px;box-shadow:0 2px 5px rgba(0,0,0,0.1)}
+.story img{width:100%;height:auto;object-fit:cover;border-radius:8px;margin-bottom:10px}
+.story h2{color:#c00;font-size:1.3em;margin:10px 0;word-wrap:break-word;line-height:1.3}
+.story a{color:#c00;text-decoration:none}
+.story a:hover{text-decoration:underline}
+.date{color:#666;font-size:0.85em;margin-top:8px}
+.pager{text-align:center;margin:30px 0;font-weight:bold}
+.pager a{color:#c00;text-decoration:none}
+.sections{text-align:center;margin:30px 0;line-height:2}
+.sections a{color:#c00;text-decoration:none;margin:0 8px;white-space:nowrap}
+.search{display:flex;margin:10px 0 20px}
+.search input{flex:1;padding:12px;border:1px solid #ddd;border-radius:4px 0 0 4px;font-family:Georgia,serif;font-size:1em}
+.search button{background:#c00;color:#fff;padding:12px 20px;border:none;border-radius:0 4px 4px 0;cursor:pointer;font-weight:bold;font-size:1em}
+footer{text-align:center;padding:30px 15px;color:#666;border-top:3px solid #c00;margin-top:30px}
+footer p{margin:8px 0;font-size:0.9em}
+@media (min-width: 768px){
+nav{padding:15px}
+nav a{font-size:1em;padding:10px 15px}
+.logo{display:inline-block;margin-bottom:0;margin-right:20px}
+header{padding:40px 20px}
+h1{font-size:3em}
+.tagline{font-size:1.2em}
+.main{padding:20px}
+.story{padding:20px}
+.story img{height:250px}
+.story h2{font-size:2em}
+}
+""",
+    "about": """*{margin:0;padding:0;box-sizing:border-box}
+body{font-family:Georgia,serif;background:#f5f5f5;margin:0;font-size:16px}
+nav{background:#333;padding:10px}
+nav a{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}
+.logo{color:#c00;font-weight:bold;display:block;margin-bottom:8px}
+.main{max-width:800px;margin:20px auto;background:#fff;padding:20px;border-radius:8px}
+h1{color:#c00;margin-bottom:15px;font-size:1.8em}
+p{line-height:1.7;margin:12px 0;word-wrap:break-word}
+@media (min-width: 768px){
+nav{padding:15px}
+nav a{font-size:1em;padding:10px 15px}
+.logo{display:inline-block;margin-bottom:0}
+.main{margin:40px auto;padding:40px}
+h1{font-size:2.5em}
+p{line-height:1.8;margin:15px 0}
+}
+""",
+    "contact": """*{margin:0;padding:0;box-sizing:border-box}
+body{font-family:Georgia,serif;background:#f5f5f5;margin:0;font-size:16px}
+nav{background:#333;padding:10px}
+nav a{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}
+.logo{color:#c00;font-weight:bold;display:block;margin-bottom:8px}
+.main{max-width:600px;margin:20px auto;background:#fff;padding:20px;border-radius:8px}
+h1{color:#c00;margin-bottom:15px;font-size:1.8em}
+input,textarea{width:100%;padding:12px;margin:10px 0;border:1px solid #ddd;border-radius:4px;font-family:Georgia,serif;font-size:1em}
+textarea{min-height:120px}
+button{background:#c00;color:#fff;padding:14px;border:none;border-radius:4px;cursor:pointer;width:100%;font-size:1em;font-weight:bold}
+button:active{background:#900}
+.success{background:#4CAF50;color:#fff;padding:15px;margin-bottom:15px;border-radius:4px;display:none}
+@media (min-width: 768px){
+nav{padding:15px}
+nav a{font-size:1em;padding:10px 15px}
+.logo{display:inline-block;margin-bottom:0}
+.main{margin:40px auto;padding:40px}
+h1{font-size:2.5em}
+button{width:auto;padding:14px 30px}
+}
+""",
+}
 
-function getCurrentUser() {{
+COMMENTS_JS = """const COMMENTS_KEY = 'comments_' + ARTICLE_ID;
+
+function getCurrentUser() {
     const user = localStorage.getItem('current_user');
     return user ? JSON.parse(user) : null;
-}}
+}
 
-function checkLoginStatus() {{
+function checkLoginStatus() {
     const user = getCurrentUser();
-    if (user) {{
+    if (user) {
         document.getElementById('loginPrompt').style.display = 'none';
         document.getElementById('commentForm').style.display = 'block';
-    }} else {{
+    } else {
         document.getElementById('loginPrompt').style.display = 'block';
         document.getElementById('commentForm').style.display = 'none';
-    }}
-}}
+    }
+}
 
-function loadComments() {{
+function loadComments() {
     const comments = JSON.parse(localStorage.getItem(COMMENTS_KEY) || '[]');
     const container = document.getElementById('commentsList');
     
-    if (comments.length === 0) {{
+    if (comments.length === 0) {
         container.innerHTML = '<div class="no-comments">No comments yet. Be the first!</div>';
         return;
-    }}
+    }
     
     container.innerHTML = comments.map(c => `
         <div class="comment">
-            <div class="comment-author">${{c.username}}</div>
-            <div class="comment-date">${{c.date}}</div>
-            <div class="comment-text">${{c.text}}</div>
+            <div class="comment-author">${c.username}</div>
+            <div class="comment-date">${c.date}</div>
+            <div class="comment-text">${c.text}</div>
         </div>
     `).join('');
-}}
+}
 
-function postComment() {{
+function postComment() {
     const user = getCurrentUser();
-    if (!user) {{
+    if (!user) {
         alert('Please login to comment');
         window.location.href = '../login.html';
         return;
-    }}
+    }
     
     const text = document.getElementById('commentText').value.trim();
-    if (!text) {{
+    if (!text) {
         alert('Please enter a comment!');
         return;
-    }}
+    }
     
     const comments = JSON.parse(localStorage.getItem(COMMENTS_KEY) || '[]');
-    comments.unshift({{
+    comments.unshift({
         username: user.username,
         text: text,
-        date: new Date().toLocaleString('en-US', {{timeZone: 'America/Chicago'}})
-    }});
+        date: new Date().toLocaleString('en-US', {timeZone: 'America/Chicago'})
+    });
     
     localStorage.setItem(COMMENTS_KEY, JSON.stringify(comments));
     document.getElementById('commentText').value = '';
     loadComments();
-}}
+}
 
 checkLoginStatus();
 loadComments();
-</script>
-</body>
-</html>"""
+"""
+
+CRITICAL_SELECTORS = {"*", "body", "nav", "nav a", ".logo"}
+ASSETS_DIR = "assets"
+
+def scope_selector(kind, selector):
+    return ",".join(f"body.pg-{kind}{sel[4:]}" if sel.startswith("body") else f".pg-{kind} {sel}"
+                    for sel in selector.split(","))
+
+def split_style(kind, css):
+    # Returns (critical, shared) stylesheets; @media blocks are split the same way
+    critical, shared = [], []
+    media = None
+    for line in css.splitlines():
+        if line.startswith("@media"):
+            media, media_critical, media_shared = line, [], []
+        elif line == "}" and media:
+            for target, block in ((critical, media_critical), (shared, media_shared)):
+                if block:
+                    target.extend([media, *block, "}"])
+            media = None
+        else:
+            selector, rule = line.split("{", 1)
+            if selector in CRITICAL_SELECTORS:
+                (media_critical if media else critical).append(line)
+            else:
+                (media_shared if media else shared).append(scope_selector(kind, selector) + "{" + rule)
+    return "\n".join(critical), "\n".join(shared)
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{ASSETS_DIR}/{stem}.{hash_bytes(data.encode('utf-8'))[:10]}{ext}"
+
+def build_asset_partials():
+    # Asset names carry a content hash, so pages can be cached for good
+    shared_css = []
+    for kind, css in STYLES.items():
+        critical, shared = split_style(kind, css)
+        PARTIALS[f"{kind}_critical"] = critical
+        shared_css.append(shared)
+    site_css = minify_css("\n".join(shared_css))
+    comments_js = minify_js(COMMENTS_JS)
+    ASSETS[fingerprint("site.css", site_css)] = site_css
+    ASSETS[fingerprint("comments.js", comments_js)] = comments_js
+    css_path, js_path = ASSETS
+    PARTIALS["comments_js"] = js_path
+    for kind in STYLES:
+        PARTIALS[f"{kind}_style"] = (f"<style>\n{PARTIALS[f'{kind}_critical']}\n</style>\n"
+                                     f'<link rel="stylesheet" href="{{{{ prefix }}}}{css_path}">\n')
+
+ASSETS = {}
+build_asset_partials()
+
+TEMPLATE_TAG = re.compile(r"\{\{(>?)\s*(\w+)\s*\}\}")
+_compiled = {}
+
+def flatten_template(name, parts, slots):
+    # Inline partials; each {{ name }} becomes an empty slot in parts
+    source = TEMPLATES[name] if name in TEMPLATES else PARTIALS[name]
+    pos = 0
+    for m in TEMPLATE_TAG.finditer(source):
+        parts.append(source[pos:m.start()])
+        if m.group(1):
+            flatten_template(m.group(2), parts, slots)
+        else:
+            slots.append((len(parts), m.group(2)))
+            parts.append("")
+        pos = m.end()
+    parts.append(source[pos:])
+
+def compile_template(name):
+    if name not in _compiled:
+        parts = []
+        slots = []
+        flatten_template(name, parts, slots)
+        _compiled[name] = (parts, slots)
+    return _compiled[name]
+
+def render(name, context):
+    template, slots = compile_template(name)
+    parts = template[:]
+    for i, key in slots:
+        parts[i] = context[key]
+    return "".join(parts)
+
+def make_slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:50]
+
+_dedup_rng = random.Random(DEDUP_VERSION)
+DEDUP_PRIME = (1 << 31) - 1
+DEDUP_COEFFS = [(_dedup_rng.randrange(1, DEDUP_PRIME), _dedup_rng.randrange(DEDUP_PRIME)) for _ in range(DEDUP_HASHES)]
+# Filler words left out of both duplicate signatures and the search index
+STOPWORDS = {
+    "a", "after", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "he",
+    "her", "his", "in", "into", "is", "it", "its", "of", "on", "or", "our", "over", "said", "says", "she",
+    "that", "the", "their", "them", "they", "this", "to", "was", "were", "what", "when", "who", "why",
+    "will", "with", "you",
+}
+
+def entry_headline(entry):
+    return entry.get("headline") or entry["title"].rsplit(" - ", 1)[0]
+
+def headline_shingles(headline):
+    # Drops the outlet suffix NewsAPI appends ("... - CNN") and filler words
+    # so rewordings of one story share most shingles
+    headline = re.split(r"\s+[-|\u2013\u2014]\s+(?=[^-|\u2013\u2014]*$)", headline)[0]
+    words = [w.rstrip("s") if len(w) > 3 else w
+             for w in re.findall(r"[a-z0-9]+", headline.lower()) if w not in STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])} or {""}
+
+def minhash(headline):
+    values = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big")
+              for s in headline_shingles(headline)]
+    return [min((a * v + b) % DEDUP_PRIME for v in values) for a, b in DEDUP_COEFFS]
+
+def pack_signature(signature):
+    return struct.pack(f">{DEDUP_HASHES}I", *signature)
+
+def unpack_signature(packed):
+    return struct.unpack(f">{DEDUP_HASHES}I", packed)
+
+def signature_bands(packed):
+    # (band number, slice of the packed bytes) pairs
+    size = 4 * DEDUP_HASHES // DEDUP_BANDS
+    return [(i, packed[i * size:(i + 1) * size]) for i in range(DEDUP_BANDS)]
+
+def similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / DEDUP_HASHES
+
+def new_dedup_index(db=None):
+    # Signatures and LSH buckets kept in memory. With db, everything saved
+    # stays on disk and is looked up per band, so a check never loads the
+    # whole archive; pending lists the slugs save_dedup_index() still has to write
+    return {"db": db, "signatures": {}, "buckets": {}, "pending": []}
+
+def index_signature(index, slug, packed):
+    index["signatures"][slug] = packed
+    for band in signature_bands(packed):
+        index["buckets"].setdefault(band, set()).add(slug)
+
+def stored_signature(index, slug):
+    if slug in index["signatures"]:
+        return index["signatures"][slug]
+    if index["db"]:
+        row = index["db"].execute("SELECT signature FROM signatures WHERE slug = ?", (slug,)).fetchone()
+        return row[0] if row else None
+    return None
+
+def band_slugs(index, band):
+    slugs = set(index["buckets"].get(band, ()))
+    if index["db"]:
+        slugs.update(row[0] for row in index["db"].execute(
+            "SELECT slug FROM buckets JOIN signatures USING (id) WHERE band = ? AND value = ?", band))
+    return slugs
+
+def open_dedup_db():
+    # Returns the connection and whether it had to be created afresh
+    os.makedirs(os.path.dirname(DEDUP_INDEX) or ".", exist_ok=True)
+    try:
+        db = sqlite3.connect(DEDUP_INDEX)
+        if db.execute("PRAGMA user_version").fetchone()[0] == DEDUP_VERSION:
+            return db, False
+    except sqlite3.DatabaseError:
+        db.close()
+        os.remove(DEDUP_INDEX)
+        db = sqlite3.connect(DEDUP_INDEX)
+    db.executescript(f"""
+        DROP TABLE IF EXISTS signatures;
+        DROP TABLE IF EXISTS buckets;
+        CREATE TABLE signatures (id INTEGER PRIMARY KEY, slug TEXT UNIQUE NOT NULL, signature BLOB NOT NULL);
+        CREATE TABLE buckets (band INTEGER, value BLOB, id INTEGER, PRIMARY KEY (band, value, id)) WITHOUT ROWID;
+        PRAGMA user_version = {DEDUP_VERSION};
+    """)
+    return db, True
+
+def load_dedup_index(archive):
+    # archive only holds the recent months, so stories from it missing in the
+    # database are hashed and written on the next save; a new database is
+    # filled from every month once
+    db, fresh = open_dedup_db()
+    index = new_dedup_index(db)
+    stored = set()
+    if fresh:
+        print("Building duplicate index")
+        archive = load_archive()
+    else:
+        slugs = list(archive)
+        for i in range(0, len(slugs), 500):
+            chunk = slugs[i:i + 500]
+            stored.update(row[0] for row in db.execute(
+                f"SELECT slug FROM signatures WHERE slug IN ({','.join('?' * len(chunk))})", chunk))
+    for slug in archive:
+        if slug not in stored:
+            index_signature(index, slug, pack_signature(minhash(entry_headline(archive[slug]))))
+            index["pending"].append(slug)
+    if fresh:
+        save_dedup_index(index)
+    return index
+
+def save_dedup_index(index):
+    # One transaction; afterwards the rows are only on disk
+    if not index["pending"]:
+        return
+    with index["db"]:
+        index["db"].executemany("INSERT OR IGNORE INTO signatures (slug, signature) VALUES (?, ?)",
+                                [(slug, index["signatures"][slug]) for slug in index["pending"]])
+        index["db"].executemany("INSERT OR IGNORE INTO buckets SELECT ?, ?, id FROM signatures WHERE slug = ?",
+                                [(band, value, slug) for slug in index["pending"]
+                                 for band, value in signature_bands(index["signatures"][slug])])
+    index["signatures"], index["buckets"], index["pending"] = {}, {}, []
+
+def find_duplicate(index, signature):
+    candidates = set()
+    for band in signature_bands(pack_signature(signature)):
+        candidates |= band_slugs(index, band)
+    best, score = None, 0
+    for slug in sorted(candidates):
+        s = similarity(signature, unpack_signature(stored_signature(index, slug)))
+        if s > score:
+            best, score = slug, s
+    return (best, score) if score >= DEDUP_THRESHOLD else (None, score)
+
+def unique_slug(headline, taken):
+    # make_slug() truncates, so two different headlines can share a slug;
+    # the later one gets a suffix derived from the headline itself.
+    # taken(slug) says whether a slug is in use.
+    slug = make_slug(headline)
+    if not taken(slug + ".html"):
+        return slug + ".html"
+    digest = hashlib.sha1(headline.encode("utf-8")).hexdigest()
+    for n in range(6, len(digest) + 1):
+        candidate = f"{slug[:50 - n - 1].rstrip('-')}-{digest[:n]}.html"
+        if not taken(candidate):
+            return candidate
+    raise ValueError(f"No free slug for {headline!r}")
+
+def dedupe_headlines(headlines, archive, index, limit=STORIES_PER_RUN):
+    # Drops headlines that reword an archived story or an earlier headline of
+    # this run, and gives up to limit survivors collision-free slugs. The
+    # survivors' signatures go into a separate index that is only merged into
+    # the archive's with merge_dedup_index() once they are archived
+    kept = []
+    skipped = 0
+    run = new_dedup_index()
+    # The index knows every archived slug, the article files cover anything it missed
+    def taken(slug):
+        return (slug in run["signatures"] or slug in archive or stored_signature(index, slug) is not None
+                or os.path.exists(f"articles/{slug}"))
+    for article in headlines:
+        if len(kept) >= limit:
+            break
+        signature = minhash(article["title"])
+        slug, score = find_duplicate(index, signature)
+        if not slug:
+            slug, score = find_duplicate(run, signature)
+        if slug:
+            print(f"Duplicate: {article['title']!r} ~ {slug} ({score:.2f})")
+            skipped += 1
+            continue
+        article = dict(article, slug=unique_slug(article["title"], taken))
+        if article["slug"] != make_slug(article["title"]) + ".html":
+            print(f"Slug collision: {article['title']!r} stored as {article['slug']}")
+        index_signature(run, article["slug"], pack_signature(signature))
+        run["pending"].append(article["slug"])
+        kept.append(article)
+    return kept, skipped, run
+
+def merge_dedup_index(index, run):
+    for slug in run["pending"]:
+        index_signature(index, slug, run["signatures"][slug])
+        index["pending"].append(slug)
+
+def get_image(headline, original_image=None):
+    # Use original article image if available
+    if original_image:
+        return original_image
     
-    return {"title": title, "slug": slug, "date": date, "html": html, "image": img}
+    # Fallback: Use site logo
+    return "https://via.placeholder.com/1200x600/c00/ffffff?text=The+Tabloid+Times"
 
-def make_homepage(articles):
-    now = get_cst_time().strftime("%B %d, %Y at %I:%M %p CST")
-    items = ""
-    for a in articles:
-        img = a.get("image", "https://via.placeholder.com/1200x600/c00/ffffff?text=The+Tabloid+Times")
-        items += f'<div class="story"><a href="articles/{a["slug"]}"><img src="{img}" onerror="this.src=\'https://placehold.co/800x400/FF6B6B/ffffff?text=NEWS\'"></a><h2><a href="articles/{a["slug"]}">{a["title"]}</a></h2><p>{a["date"]}</p></div>'
+# Phrase pools for article_text(); {h} is the headline in lower case, {H} in upper case
+# Bill Burr style roasts - angry, brutally honest, hilarious
+ROASTS = [
+    "Oh Jesus Christ, really? {h}? This is what we're doing now? THIS is what's important?",
+    "So let me get this straight - {h}. And everybody's acting like this matters. Are you KIDDING me?",
+    "You gotta be fu- you gotta be kidding me. {h}. WHO CARES?!",
+    "{H}! OH MY GOD! Can we just - can we STOP pretending like this is news?",
+    "Alright, alright, alright. So {h}. And I'm supposed to give a shit about this? Really?",
+    "Here we go again. {h}. Another day, another stupid story that doesn't matter.",
+    "Oh for Christ's sake. {h}. This is what passes for journalism now?",
+]
+
+COMMENTARY = [
+    "Look, I'm not saying this isn't A thing. I'm saying it's not a thing WE need to care about. There's a difference!",
+    "And everyone's got an opinion about it. EVERYONE. Like suddenly every moron with a phone is an expert.",
+    "You know what kills me? The fact that we're talking about this instead of literally anything else that matters.",
+    "The media's acting like this is the biggest story of the year. It's Tuesday! It's not even a good Tuesday!",
+    "Here's the thing - and I love this - nobody actually cares. But we're all gonna pretend we do for like, 48 hours.",
+    "And the comments! Oh my God, the COMMENTS. Everyone's got a hot take. Everyone thinks they're right. Nobody knows anything!",
+    "You know what this reminds me of? Remember when we used to care about actual problems? Yeah, me neither.",
+    "I'm watching this unfold and I'm thinking, 'This is it. This is what we've become. THIS is the pinnacle of human civilization.'",
+    "The problem is nobody has anything better to do. So we just sit around caring about stuff that doesn't affect us AT ALL.",
+    "And you know what the worst part is? Tomorrow there'll be something else. Some OTHER stupid thing. It never ends!",
+]
+
+FOLLOWUPS = [
+    "So naturally, the 'experts' came out of the woodwork. Because of COURSE they did.",
+    "People on Twitter are losing their minds. Which, let's be honest, they were gonna do anyway.",
+    "Somebody called for an investigation. AN INVESTIGATION! Into THIS!",
+    "The news is covering this 24/7. TWENTY. FOUR. SEVEN. Like there's nothing else happening in the world.",
+    "And now politicians are weighing in. OH GREAT. Just what we needed - politicians' opinions on this.",
+    "Social media's having a meltdown. Shocking. Absolutely shocking. Said no one.",
+    "They're doing analysis on it. ANALYSIS! They got charts and graphs and everything. For THIS!",
+    "Everyone's demanding answers. Answers to WHAT? What question are we even asking here?",
+]
+
+RANTS = [
+    "You know what I love? How we all act surprised. Like 'Oh no, I can't BELIEVE this happened!' Yeah you can. We all can.",
+    "And here's the thing about people - they LOVE being outraged. They're ADDICTED to it. It's like crack for boring people.",
+    "I'm watching all this and I'm thinking, 'We deserve everything that's coming to us. We absolutely deserve it.'",
+    "Nobody's asking the real questions. Like 'Why am I still reading this?' That's a good question. I got nothing for you.",
+    "The level of stupid here is just... *chef's kiss*. It's beautiful, really. In a horrifying way.",
+    "And we wonder why nothing gets done in this country. THIS. This is why. Because we're focused on THIS!",
+    "I'm not even mad anymore. I'm impressed. Impressed that we've reached this level of absurdity and just rolled with it.",
+]
+
+CLOSERS = [
+    "Anyway, that's the news. I'm gonna go drink now. You should too.",
+    "And that's it. That's the story. Congratulations, you're dumber for having read it. You're welcome.",
+    "Alright, I'm done. I can't - I can't talk about this anymore. It's too stupid. I'm out.",
+    "So yeah. That happened. Check back tomorrow when something else stupid happens. Spoiler alert: it will.",
+    "In conclusion: we're all doomed. Not because of this story. Just in general. Have a nice day!",
+    "That's all I got. Now if you'll excuse me, I need to go question my life choices.",
+]
+
+TITLE_TAGS = ["EXCLUSIVE", "BREAKING", "DEVELOPING", "SHOCKING", "UNBELIEVABLE"]
+
+# The pools as ready-made paragraphs, built once at import
+ROAST_PARAGRAPHS = [f"<p>{line}</p>" for line in ROASTS]
+COMMENTARY_PARAGRAPHS = [f"<p>{line}</p>" for line in COMMENTARY]
+FOLLOWUP_PARAGRAPHS = [f"<p>{line}</p>" for line in FOLLOWUPS]
+RANT_PARAGRAPHS = [f"<p>{line}</p>" for line in RANTS]
+CLOSER_PARAGRAPHS = [f"<p>{line}</p>" for line in CLOSERS]
+
+def article_text(headline, rng):
+    # Generate Bill Burr-style roasts. The same rng state always gives the
+    # same story, and the two commentary lines are drawn without replacement
+    # so a story never repeats itself.
+    # Headlines come from upstream feeds, so they are escaped wherever they
+    # land in markup; the returned title is plain text
+    h, H = escape_html(headline.lower()), escape_html(headline.upper())
+    roast = rng.choice(ROAST_PARAGRAPHS).format(h=h, H=H)
+    first, second = rng.sample(COMMENTARY_PARAGRAPHS, 2)
+    content = "".join((
+        f"<p><strong>Alright, so here's what happened: {h}.</strong></p>",
+        roast, first, rng.choice(FOLLOWUP_PARAGRAPHS), rng.choice(RANT_PARAGRAPHS), second,
+        rng.choice(CLOSER_PARAGRAPHS),
+    ))
+    title = headline.upper() + " - " + rng.choice(TITLE_TAGS)
+    return title, content
+
+def render_article(headline, slug, title, content, date, img, original_url=None, images=None):
+    # Create source link section
+    source_link = ""
+    if original_url:
+        source_link = f'<p style="background:#f0f0f0;padding:15px;border-radius:8px;margin:20px 0"><strong>📰 Original Story:</strong> <a href="{escape_html(original_url)}" target="_blank" style="color:#c00;text-decoration:underline">Read the actual news article here</a></p>'
     
-    return f"""<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=5.0">
-<title>The Tabloid Times</title>
-<style>
-*{{margin:0;padding:0;box-sizing:border-box}}
-body{{font-family:Georgia,serif;background:#f5f5f5;margin:0;font-size:16px}}
-nav{{background:#333;padding:10px}}
-nav a{{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}}
-.logo{{color:#c00;font-weight:bold;display:block;margin-bottom:8px}}
-header{{background:#c00;color:#fff;padding:30px 15px;text-align:center}}
-h1{{font-size:2em;text-transform:uppercase;word-wrap:break-word}}
-.tagline{{font-size:1em;margin-top:8px}}
-.main{{max-width:1000px;margin:0 auto;padding:15px}}
-.updated{{text-align:center;color:#666;margin-bottom:20px;font-size:0.9em}}
-.story{{background:#fff;margin:15px 0;padding:15px;border-radius:8px;box-shadow:0 2px 5px rgba(0,0,0,0.1)}}
-.story img{{width:100%;height:auto;object-fit:cover;border-radius:8px;margin-bottom:10px}}
-.story h2{{color:#c00;font-size:1.3em;margin:10px 0;word-wrap:break-word;line-height:1.3}}
-.story a{{color:#c00;text-decoration:none}}
-.story a:hover{{text-decoration:underline}}
-.date{{color:#666;font-size:0.85em;margin-top:8px}}
-footer{{text-align:center;padding:30px 15px;color:#666;border-top:3px solid #c00;margin-top:30px}}
-footer p{{margin:8px 0;font-size:0.9em}}
-@media (min-width: 768px){{
-nav{{padding:15px}}
-nav a{{font-size:1em;padding:10px 15px}}
-.logo{{display:inline-block;margin-bottom:0;margin-right:20px}}
-header{{padding:40px 20px}}
-h1{{font-size:3em}}
-.tagline{{font-size:1.2em}}
-.main{{padding:20px}}
-.story{{padding:20px}}
-.story img{{height:250px}}
-.story h2{{font-size:2em}}
-}}
-</style>
-</head>
-<body>
-<nav>
-<a href="index.html" class="logo">The Tabloid Times</a>
-<a href="about.html">About</a>
-<a href="contact.html">Contact</a>
-<a href="login.html">Login</a>
-<a href="admin.html">Admin</a>
-</nav>
-<header>
-<h1>The Tabloid Times</h1>
-<p class="tagline">SHOCKING NEWS - EXCLUSIVE STORIES</p>
-</header>
-<div class="main">
-<p class="updated">Updated: {now}</p>
-{items}
-</div>
-<footer>
-<p>All stories are AI generated satire.</p>
-<p>&copy; 2026 The Tabloid Times</p>
-</footer>
-</body>
-</html>"""
+    url = f"{SITE_URL}articles/{slug}"
+    share_title = quote(headline)
+    if images:
+        img = "../" + images["full"]["src"]
+    
+    return render("article", {
+        "prefix": "../", "title": escape_html(title), "date": date, "source_link": source_link, "img": escape_html(img),
+        "img_attrs": image_attrs(images, "../", False),
+        "content": content, "share_title": share_title, "url": url, "slug": slug
+    })
+
+def make_article(headline, original_image=None, original_url=None, images=None, slug=None, date=None):
+    slug = slug or make_slug(headline) + ".html"
+    # Seeded from the slug so re-rendering the story gives the same roast
+    title, content = article_text(headline, random.Random(slug))
+    date = date or get_cst_time().strftime("%B %d, %Y at %I:%M %p CST")
+    img = get_image(headline, original_image)
+    html = render_article(headline, slug, title, content, date, img, original_url, images)
+    return {"title": title, "slug": slug, "date": date, "html": html, "image": img, "images": images}
+
+def make_articles(stories):
+    # Renders a run's stories in one go; stories are make_article() keyword
+    # dicts and share one timestamp, so the same batch always gives the same pages
+    date = get_cst_time().strftime("%B %d, %Y at %I:%M %p CST")
+    return [make_article(date=date, **story) for story in stories]
+
+ARTICLE_FIELDS = {
+    "headline": re.compile(r'twitter\.com/intent/tweet\?text=(.*?)&url=https://thedailytab'),
+    "title": re.compile(r"<h1>(.*?)</h1>"),
+    "date": re.compile(r'<p style="color:#666;font-size:0\.9em">(.*?)</p>'),
+    "url": re.compile(r'<strong>📰 Original Story:</strong> <a href="(.*?)" target="_blank"'),
+    "image": re.compile(r'<img src="(https?://.*?)" alt="Article Image"'),
+    "content": re.compile(r'<img src="[^"]*"[^>]*>\n(<p>.*?)\n<div class="share">', re.S),
+}
+
+def read_article(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_article(f.read())
+
+def parse_article(html):
+    # Pull the published text back out of an article page
+    found = {}
+    for field, pattern in ARTICLE_FIELDS.items():
+        m = pattern.search(html)
+        found[field] = m.group(1) if m else None
+    # Pages store these escaped; callers get plain text back
+    if found["headline"]:
+        found["headline"] = unquote(found["headline"])
+    for field in ("title", "url", "image"):
+        if found[field]:
+            found[field] = unescape_html(found[field])
+    return found
+
+def rebuild_article(entry):
+    # Keeps the published roast when the page exists, otherwise regenerates it from the slug seed
+    path = f"articles/{entry['slug']}"
+    old = read_article(path) if os.path.exists(path) else {}
+    headline = entry_headline(dict(entry, headline=entry.get("headline") or old.get("headline")))
+    title, content = article_text(headline, random.Random(entry["slug"]))
+    title = old.get("title") or entry["title"]
+    content = old.get("content") or content
+    date = entry.get("date") or old.get("date") or get_cst_time().strftime("%B %d, %Y at %I:%M %p CST")
+    img = get_image(headline, entry.get("image") or old.get("image"))
+    html = render_article(headline, entry["slug"], title, content, date, img, entry.get("url") or old.get("url"),
+                          entry.get("images"))
+    return path, write_if_changed(path, html)
+
+def paginate(articles, size=PAGE_SIZE):
+    # Older pages are cut from the oldest end so they never shift once full;
+    # the front page keeps the newest size..2*size-1 stories
+    full = max(0, len(articles) // size - 1)
+    front = articles[:len(articles) - full * size]
+    pages = []
+    for i in range(full):
+        end = len(articles) - i * size
+        pages.append((i + 2, articles[end - size:end]))
+    return front, pages
+
+def story_html(a, prefix):
+    img = a.get("image", "https://via.placeholder.com/1200x600/c00/ffffff?text=The+Tabloid+Times")
+    images = a.get("images")
+    if images:
+        img = prefix + images["thumb"]["src"]
+    return render("story", {"prefix": prefix, "slug": a["slug"], "img": escape_html(img),
+                            "img_attrs": image_attrs(images, prefix, True), "title": escape_html(a["title"]),
+                            "date": a["date"]})
+
+def month_name(month):
+    return datetime.strptime(month, "%Y-%m").strftime("%B %Y")
+
+def render_sections(sections, prefix):
+    # sections is [(label, [(href, text), ...]), ...]; text is plain, e.g. a feed's name
+    return "".join(f'\n<p class="sections"><strong>{label}:</strong> ' +
+                   "".join(f'<a href="{prefix}{href}">{escape_html(text)}</a>' for href, text in links) + "</p>"
+                   for label, links in sections if links)
+
+def render_listing(articles, prefix="", title="The Tabloid Times", updated=None, older=None, sections=()):
+    return render("listing", {
+        "prefix": prefix,
+        "title": escape_html(title),
+        "updated": f'<p class="updated">Updated: {updated}</p>\n' if updated else "",
+        "items": "".join(story_html(a, prefix) for a in articles),
+        "pager": f'\n<p class="pager"><a href="{older}">Older stories &rarr;</a></p>' if older else "",
+        "sections": render_sections(sections, prefix)
+    })
+
+def make_homepage(articles, months=(), tags=None):
+    now = get_cst_time().strftime("%B %d, %Y at %I:%M %p CST")
+    sections = [("Archive", [(f"{ARCHIVE_DIR}/{m}.html", month_name(m)) for m in reversed(months)])]
+    for kind, label in zip(TAG_KINDS, ("Sections", "Sources")):
+        sections.append((label, [(f"{key}.html", name) for key, name in tag_links(tags, kind)]))
+    return render_listing(articles, updated=now, sections=sections)
+
+def make_month_page(month, number, articles, older):
+    # No timestamp here, and older only ever points back in time, so a closed
+    # month renders the same bytes forever
+    title = f"The Tabloid Times - {month_name(month)}" + (f" (page {number})" if number > 1 else "")
+    return render_listing(articles, prefix="../", title=title, older=older)
 
 def make_about():
     # Check if custom about content exists in a file
-    custom_about_file = "about_custom.txt"
+    custom_about_file = ABOUT_CUSTOM
     if os.path.exists(custom_about_file):
         with open(custom_about_file, "r", encoding="utf-8") as f:
             custom_content = f.read()
     else:
         custom_content = "<p>AI-powered satirical news. Nothing is real!</p>"
     
-    return f"""<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=5.0">
-<title>About</title>
-<style>
-*{{margin:0;padding:0;box-sizing:border-box}}
-body{{font-family:Georgia,serif;background:#f5f5f5;margin:0;font-size:16px}}
-nav{{background:#333;padding:10px}}
-nav a{{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}}
-.logo{{color:#c00;font-weight:bold;display:block;margin-bottom:8px}}
-.main{{max-width:800px;margin:20px auto;background:#fff;padding:20px;border-radius:8px}}
-h1{{color:#c00;margin-bottom:15px;font-size:1.8em}}
-p{{line-height:1.7;margin:12px 0;word-wrap:break-word}}
-@media (min-width: 768px){{
-nav{{padding:15px}}
-nav a{{font-size:1em;padding:10px 15px}}
-.logo{{display:inline-block;margin-bottom:0}}
-.main{{margin:40px auto;padding:40px}}
-h1{{font-size:2.5em}}
-p{{line-height:1.8;margin:15px 0}}
-}}
-</style>
-</head>
-<body>
-<nav>
-<a href="index.html" class="logo">The Tabloid Times</a>
-<a href="about.html">About</a>
-<a href="contact.html">Contact</a>
-<a href="login.html">Login</a>
-<a href="admin.html">Admin</a>
-</nav>
-<div class="main">
-<h1>About The Tabloid Times</h1>
-{custom_content}
-</div>
-</body>
-</html>"""
+    return render("about", {"prefix": "", "title": "About", "custom_content": custom_content})
 
 def make_contact():
-    return """<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=5.0">
-<title>Contact</title>
-<style>
-*{margin:0;padding:0;box-sizing:border-box}
-body{font-family:Georgia,serif;background:#f5f5f5;margin:0;font-size:16px}
-nav{background:#333;padding:10px}
-nav a{color:#fff;text-decoration:none;padding:8px 12px;font-size:0.9em;display:inline-block}
-.logo{color:#c00;font-weight:bold;display:block;margin-bottom:8px}
-.main{max-width:600px;margin:20px auto;background:#fff;padding:20px;border-radius:8px}
-h1{color:#c00;margin-bottom:15px;font-size:1.8em}
-input,textarea{width:100%;padding:12px;margin:10px 0;border:1px solid #ddd;border-radius:4px;font-family:Georgia,serif;font-size:1em}
-textarea{min-height:120px}
-button{background:#c00;color:#fff;padding:14px;border:none;border-radius:4px;cursor:pointer;width:100%;font-size:1em;font-weight:bold}
-button:active{background:#900}
-.success{background:#4CAF50;color:#fff;padding:15px;margin-bottom:15px;border-radius:4px;display:none}
-@media (min-width: 768px){
-nav{padding:15px}
-nav a{font-size:1em;padding:10px 15px}
-.logo{display:inline-block;margin-bottom:0}
-.main{margin:40px auto;padding:40px}
-h1{font-size:2.5em}
-button{width:auto;padding:14px 30px}
-}
-</style>
-</head>
-<body>
-<nav>
-<a href="index.html" class="logo">The Tabloid Times</a>
-<a href="about.html">About</a>
-<a href="contact.html">Contact</a>
-<a href="login.html">Login</a>
-<a href="admin.html">Admin</a>
-</nav>
-<div class="main">
-<h1>Contact Us</h1>
-<div id="msg" class="success">Message sent!</div>
-<form id="f">
-<input id="n" placeholder="Name" required>
-<input id="e" type="email" placeholder="Email" required>
-<textarea id="m" placeholder="Message" required></textarea>
-<button type="submit">Send Message</button>
-</form>
-</div>
-<script>
-document.getElementById('f').onsubmit=function(ev){
-ev.preventDefault();
-var msgs=JSON.parse(localStorage.getItem('tabloid_messages')||'[]');
-msgs.unshift({id:Date.now(),name:document.getElementById('n').value,email:document.getElementById('e').value,message:document.getElementById('m').value,date:new Date().toLocaleString()});
-localStorage.setItem('tabloid_messages',JSON.stringify(msgs));
-document.getElementById('msg').style.display='block';
-this.reset();
-setTimeout(function(){document.getElementById('msg').style.display='none'},3000)
-};
-</script>
-</body>
-</html>"""
+    return render("contact", {"prefix": "", "title": "Contact"})
 
 def make_config():
     u = os.environ.get("ADMIN_USERNAME", "admin")
@@ -482,39 +1822,615 @@ def make_config():
     ph = hashlib.sha256(p.encode()).hexdigest()
     return f"const ADMIN_USERNAME_HASH='{uh}';\nconst ADMIN_PASSWORD_HASH='{ph}';\n"
 
-def main():
-    print("Starting...")
-    os.makedirs("articles", exist_ok=True)
-    
-    headlines = fetch_news()
-    archive = load_archive()
+# Words that come from the roast phrase pools rather than the story itself
+BOILERPLATE_TERMS = set(re.findall(r"[^\W_]+", " ".join(
+    ROASTS + COMMENTARY + FOLLOWUPS + RANTS + CLOSERS + TITLE_TAGS + ["Alright, so here's what happened"]
+).replace("{h}", " ").replace("{H}", " ").casefold()))
+
+def tokenize(text):
+    return [t for t in re.findall(r"[^\W_]+", text.casefold()) if len(t) >= SEARCH_MIN_LENGTH and t not in STOPWORDS]
+
+def shard_key(term):
+    return "".join(c if c in "abcdefghijklmnopqrstuvwxyz0123456789" else "_" for c in term[:SEARCH_PREFIX])
+
+def document_terms(entry):
+    # Headline words always count; body words only when they aren't roast boilerplate
+    terms = set(tokenize(entry_headline(entry)))
+    path = f"articles/{entry['slug']}"
+    if os.path.exists(path):
+        body = re.sub(r"<[^>]+>", " ", read_article(path).get("content") or "")
+        terms.update(t for t in tokenize(body) if t not in BOILERPLATE_TERMS)
+    return terms
+
+def read_json(path, default):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return default
+
+def write_json(path, data, report):
+    record(report, path, write_if_changed(path, json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True)))
+
+def search_meta():
+    meta = read_json(f"{SEARCH_DIR}/meta.json", None)
+    if meta and meta.get("version") == SEARCH_VERSION and meta.get("prefix") == SEARCH_PREFIX and meta.get("block") == SEARCH_BLOCK:
+        return meta
+    return None
+
+def index_documents(entries, meta, report, fresh=False):
+    # Appends entries (oldest first) as new documents and rewrites only the
+    # term shards, id shards and document blocks they touch. A story that is
+    # already in the index is tombstoned and indexed again under a new id.
+    # fresh ignores the files on disk. Returns the paths written.
+    for sub in ("terms", "docs", "ids"):
+        os.makedirs(f"{SEARCH_DIR}/{sub}", exist_ok=True)
+    def load(path, default):
+        return default if fresh else read_json(path, default)
+    written = set()
+    def write(path, data):
+        write_json(path, data, report)
+        written.add(path)
+    blocks = {}
+    touched = set()
+    def block(number):
+        if number not in blocks:
+            blocks[number] = load(f"{SEARCH_DIR}/docs/{number}.json", [])
+        return blocks[number]
+    # slug -> current doc id, sharded like the terms
+    doc_ids = {}
+    def id_shard(key):
+        if key not in doc_ids:
+            doc_ids[key] = load(f"{SEARCH_DIR}/ids/{key}.json", {})
+        return doc_ids[key]
+    postings = {}
+    for entry in entries:
+        shard = id_shard(shard_key(entry["slug"]))
+        old = shard.get(entry["slug"])
+        if old is not None:
+            block(old // SEARCH_BLOCK)[old % SEARCH_BLOCK] = None
+            touched.add(old // SEARCH_BLOCK)
+        doc_id = meta["docs"]
+        shard[entry["slug"]] = doc_id
+        meta["docs"] += 1
+        block(doc_id // SEARCH_BLOCK).append([entry["slug"], entry["title"], entry["date"]])
+        touched.add(doc_id // SEARCH_BLOCK)
+        for term in document_terms(entry):
+            postings.setdefault(shard_key(term), {}).setdefault(term, []).append(doc_id)
+    for key, terms in postings.items():
+        path = f"{SEARCH_DIR}/terms/{key}.json"
+        shard = load(path, {})
+        for term, ids in terms.items():
+            shard[term] = shard.get(term, []) + ids
+        write(path, shard)
+    for number in sorted(touched):
+        write(f"{SEARCH_DIR}/docs/{number}.json", blocks[number])
+    for key, shard in doc_ids.items():
+        write(f"{SEARCH_DIR}/ids/{key}.json", shard)
+    write(f"{SEARCH_DIR}/meta.json", meta)
+    return written
+
+def build_search_index(archive, report):
+    # Full build, oldest story first so ids follow publication order. Shards
+    # that come out the same are left alone; only ones the new index no
+    # longer has are deleted, with their compressed copies
+    meta = {"version": SEARCH_VERSION, "prefix": SEARCH_PREFIX, "block": SEARCH_BLOCK, "docs": 0}
+    written = index_documents(list(archive.values()), meta, report, fresh=True)
+    for sub in ("terms", "docs", "ids"):
+        for name in os.listdir(f"{SEARCH_DIR}/{sub}"):
+            path = f"{SEARCH_DIR}/{sub}/{name}"
+            if re.sub(r"\.(gz|br)$", "", path) not in written:
+                os.remove(path)
+                if path.endswith(".json"):
+                    report["deleted"].append(path)
+
+def update_search_index(new, report):
+    meta = search_meta()
+    if meta is None:
+        print("Building search index")
+        build_search_index(load_archive(), report)
+    elif new:
+        index_documents(new, meta, report)
+
+def make_search():
+    config = {"prefix": SEARCH_PREFIX, "block": SEARCH_BLOCK, "min": SEARCH_MIN_LENGTH,
+              "limit": SEARCH_LIMIT, "stop": sorted(STOPWORDS)}
+    return render("search", {"prefix": "", "title": "Search", "config": json.dumps(config, separators=(",", ":"))})
+
+_undated = set()
+
+def entry_datetime(entry):
+    # Dates are written in CST; early stories left the " CST" off. Falls back
+    # to the source's publish time, else None (reported once per story)
+    date = entry.get("date", "")
+    try:
+        return datetime.strptime(date.replace(" CST", ""), "%B %d, %Y at %I:%M %p").replace(tzinfo=timezone(timedelta(hours=-6)))
+    except ValueError:
+        pass
+    if entry.get("published"):
+        try:
+            return datetime.fromisoformat(entry["published"])
+        except ValueError:
+            pass
+    if entry.get("slug") not in _undated:
+        _undated.add(entry.get("slug"))
+        print(f"Unreadable date {date!r} on {entry.get('slug')}")
+    return None
+
+def make_rss(articles):
+    items = []
+    for a in articles[:FEED_SIZE]:
+        link = f"{SITE_URL}articles/{a['slug']}"
+        when = entry_datetime(a)
+        pub_date = f"<pubDate>{when.strftime('%a, %d %b %Y %H:%M:%S %z')}</pubDate>\n" if when else ""
+        items.append(f"""<item>
+<title>{escape(a["title"])}</title>
+<link>{escape(link)}</link>
+<guid isPermaLink="true">{escape(link)}</guid>
+{pub_date}</item>
+""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">
+<channel>
+<title>The Tabloid Times</title>
+<link>{SITE_URL}</link>
+<description>SHOCKING NEWS - EXCLUSIVE STORIES. All stories are AI generated satire.</description>
+<atom:link href="{SITE_URL}feed.xml" rel="self" type="application/rss+xml"/>
+{"".join(items)}</channel>
+</rss>
+"""
+
+def feed_item(a):
+    item = {
+        "id": a["slug"],
+        "url": f"{SITE_URL}articles/{a['slug']}",
+        "title": a["title"]
+    }
+    when = entry_datetime(a)
+    if when:
+        item["date_published"] = when.isoformat()
+    if a.get("image"):
+        item["image"] = a["image"]
+    if a.get("url"):
+        item["external_url"] = a["url"]
+    return item
+
+def make_json_feed(articles, name, next_name=None):
+    # JSON Feed 1.1; next_url walks from api/latest.json back through the months
+    feed = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": "The Tabloid Times",
+        "home_page_url": SITE_URL,
+        "feed_url": f"{SITE_URL}api/{name}",
+        "items": [feed_item(a) for a in articles]
+    }
+    if next_name:
+        feed["next_url"] = f"{SITE_URL}api/{next_name}"
+    return json.dumps(feed, ensure_ascii=False, separators=(",", ":"))
+
+def make_sitemap(urls):
+    entries = "".join(f"<url><loc>{escape(loc)}</loc>" + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "") + "</url>\n"
+                      for loc, lastmod in urls)
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+{entries}</urlset>
+"""
+
+def make_sitemap_index(names):
+    entries = "".join(f"<sitemap><loc>{SITE_URL}{name}</loc></sitemap>\n" for name in names)
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+{entries}</sitemapindex>
+"""
+
+def article_urls(articles):
+    urls = []
+    for a in articles:
+        when = entry_datetime(a)
+        urls.append((f"{SITE_URL}articles/{a['slug']}", when.date().isoformat() if when else None))
+    return urls
+
+def build_feeds(recent, months, manifest, report):
+    # Only the newest stories; each month's JSON feed page and sitemap shard
+    # are built with its listing pages in build_month()
+    build_output("feed.xml", lambda: make_rss(recent), [recent[:FEED_SIZE]], manifest, report)
+    latest = recent[:API_PAGE_SIZE]
+    newest = f"{months[-1]}.json" if months else None
+    build_output("api/latest.json", lambda: make_json_feed(latest, "latest.json", newest), [latest, newest], manifest, report)
+    static = [(SITE_URL + name, None) for name in ("", "about.html", "contact.html", "search.html")]
+    build_output("sitemap/pages.xml", lambda: make_sitemap(static), [static], manifest, report)
+    names = ["sitemap/pages.xml"] + [f"sitemap/{m}.xml" for m in months]
+    build_output("sitemap.xml", lambda: make_sitemap_index(names), [names], manifest, report)
+
+def entry_tags(entry):
+    # (key, name) per tag; the key doubles as the listing page path
+    tags = []
+    for kind in TAG_KINDS:
+        name = entry.get(kind)
+        if name and make_slug(name):
+            tags.append((f"{kind}/{make_slug(name)}", name))
+    return tags
+
+def tag_story(index, key, name, slug, month):
+    # A story tagged again moves to the end, as the newest
+    tag = index["tags"].setdefault(key, {"name": name, "stories": {}})
+    tag["name"] = name
+    tag["stories"].pop(slug, None)
+    tag["stories"][slug] = month
+
+def add_tags(index, entries):
+    # Returns the keys whose story lists changed
+    changed = set()
+    for entry in entries:
+        month = month_of(entry)
+        for key, name in entry_tags(entry):
+            tag_story(index, key, name, entry["slug"], month)
+            index["pending"].append([key, name, entry["slug"], month])
+            changed.add(key)
+    return changed
+
+def build_tag_index(archive):
+    # tags: {key: {"name", "stories": {slug: month}}}, stories oldest first;
+    # pending: log lines not yet appended by save_tag_index()
+    index = {"tags": {}, "pending": []}
+    add_tags(index, archive.values())
+    return index
+
+def load_tag_index():
+    # Built from every month the first time, then appended to run by run.
+    # A torn last line from an interrupted append is ignored
+    index = {"tags": {}, "pending": []}
+    try:
+        with open(TAGS_INDEX, "r", encoding="utf-8") as f:
+            if json.loads(f.readline() or "{}").get("version") == TAGS_VERSION:
+                for line in f:
+                    try:
+                        tag_story(index, *json.loads(line))
+                    except (ValueError, TypeError):
+                        continue
+                return index, set()
+    except (OSError, ValueError):
+        pass
+    print("Building tag index")
+    index = build_tag_index(load_archive())
+    write_tag_index(index)
+    return index, set(index["tags"])
+
+def tag_lines(rows):
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+def write_tag_index(index):
+    # The whole log, replacing whatever was there
+    rows = [[key, tag["name"], slug, month] for key, tag in sorted(index["tags"].items())
+            for slug, month in tag["stories"].items()]
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    write_atomic(TAGS_INDEX, (json.dumps({"version": TAGS_VERSION}) + "\n" + tag_lines(rows)).encode("utf-8"))
+    index["pending"] = []
+
+def save_tag_index(index):
+    if not index["pending"]:
+        return
+    with open(TAGS_INDEX, "a", encoding="utf-8") as f:
+        f.write(tag_lines(index["pending"]))
+    index["pending"] = []
+
+def tag_links(index, kind):
+    if not index:
+        return []
+    return sorted(((key, tag["name"]) for key, tag in index["tags"].items() if key.startswith(kind + "/")),
+                  key=lambda link: link[1].casefold())
+
+def build_tag(key, tag, recent, manifest, report):
+    # Same layout as a month: key.html holds the newest stories and full
+    # pages are cut from the oldest end as key-N.html, so adding a story
+    # rewrites the front page and at most one new full page. Stories are
+    # looked up in recent first and only then in their month's partition;
+    # each page depends on the partitions its stories come from, so edits
+    # to archived entries (e.g. images backfilled by rebuild) reach it.
+    stories = list(tag["stories"].items())[::-1]
+    front, pages = paginate(stories)
+    partitions = {}
+    def lookup(pairs):
+        found = []
+        for slug, month in pairs:
+            entry = recent.get(slug)
+            if entry is None:
+                if month not in partitions:
+                    partitions[month] = load_partition(month)
+                entry = partitions[month].get(slug)
+            if entry:
+                found.append(entry)
+        return found
+    title = f"The Tabloid Times - {tag['name']}"
+    name = key.split("/", 1)[1]
+    outputs = []
+    def page(path, pairs, older, number):
+        suffix = f" (page {number})" if number > 1 else ""
+        sources = [file_fingerprint(partition_path(month), manifest) for month in sorted({m for _, m in pairs})]
+        build_output(path, lambda: render_listing(lookup(pairs), prefix="../", title=title + suffix, older=older),
+                     [pairs, title, older, sources], manifest, report)
+        outputs.append(path)
+    last_page = pages[-1][0] if pages else None
+    page(f"{key}.html", front, f"{name}.{last_page}.html" if last_page else None, 1)
+    for number, pairs in pages:
+        page(f"{key}.{number}.html", pairs, f"{name}.{number - 1}.html" if number > 2 else None, number)
+    manifest.setdefault("tags", {})[key] = outputs
+
+def build_tags(index, changed, recent, manifest, report):
+    # Only tags that gained stories this run are looked at; the rest keep
+    # their pages as listed in the manifest
+    done = manifest.setdefault("tags", {})
+    for key, tag in sorted(index["tags"].items()):
+        outputs = done.get(key)
+        if key not in changed and outputs and all(os.path.exists(path) for path in outputs):
+            report["touched"].update(outputs)
+            report["skipped"].extend(outputs)
+            continue
+        build_tag(key, tag, recent, manifest, report)
+
+def build_month(month, prev, manifest, report):
+    # A month's listing pages, JSON feed page and sitemap shard depend only on
+    # its partition, so a closed month is skipped without even being read
+    key = hash_inputs(month, prev, file_fingerprint(partition_path(month), manifest))
+    done = manifest.setdefault("months", {}).get(month)
+    if done and done["inputs"] == key and all(os.path.exists(path) for path in done["outputs"]):
+        report["touched"].update(done["outputs"])
+        report["skipped"].extend(done["outputs"])
+        return
+    entries = archive_list(load_partition(month))
+    front, pages = paginate(entries)
+    previous = f"{prev}.html" if prev else None
+    outputs = []
+    def page(path, make):
+        build_output(path, make, [key], manifest, report)
+        outputs.append(path)
+    last_page = pages[-1][0] if pages else None
+    page(f"{ARCHIVE_DIR}/{month}.html",
+         lambda: make_month_page(month, 1, front, f"{month}-{last_page}.html" if last_page else previous))
+    for number, items in pages:
+        page(f"{ARCHIVE_DIR}/{month}-{number}.html",
+             lambda: make_month_page(month, number, items, f"{month}-{number - 1}.html" if number > 2 else previous))
+    page(f"api/{month}.json", lambda: make_json_feed(entries, f"{month}.json", f"{prev}.json" if prev else None))
+    page(f"sitemap/{month}.xml", lambda: make_sitemap(article_urls(entries)))
+    manifest["months"][month] = {"inputs": key, "outputs": outputs}
+
+def write_assets(report):
+    # Never pruned: pages that haven't been rebuilt may still point at an older hash
+    os.makedirs(ASSETS_DIR, exist_ok=True)
+    for path, data in ASSETS.items():
+        sizes = write_if_changed(path, data)
+        if sizes:
+            record(report, path, sizes)
+
+def rebuild_articles(entries, manifest, report):
+    with ProcessPoolExecutor() as pool:
+        for path, sizes in pool.map(rebuild_article, entries, chunksize=16):
+            record(report, path, sizes)
+    manifest["articles"] = TEMPLATE_VERSION
+
+def build_pages(recent, manifest, report, tags, changed_tags):
+    # recent is newest first and only as deep as RECENT_SIZE needs;
+    # changed_tags are the tag pages to re-check (see build_tags())
+    admin_user = os.environ.get("ADMIN_USERNAME", "admin")
+    admin_pass = os.environ.get("ADMIN_PASSWORD", "tabloid2026")
+    months = archive_months()
+    front = recent[:PAGE_SIZE]
+    links = [tag_links(tags, kind) for kind in TAG_KINDS]
+    for directory in (ARCHIVE_DIR, "api", "sitemap") + TAG_KINDS:
+        os.makedirs(directory, exist_ok=True)
+    with span("homepage"):
+        build_output("index.html", lambda: make_homepage(front, months, tags), [front, months, links], manifest, report)
+    with span("months"):
+        for i, month in enumerate(months):
+            build_month(month, months[i - 1] if i else None, manifest, report)
+    with span("tags"):
+        build_tags(tags, changed_tags, {a["slug"]: a for a in recent}, manifest, report)
+    build_output("about.html", make_about, [file_fingerprint(ABOUT_CUSTOM, manifest)], manifest, report)
+    build_output("contact.html", make_contact, [], manifest, report)
+    build_output("search.html", make_search, [], manifest, report)
+    build_output("admin-config.js", make_config,
+                 [hash_bytes(f"{admin_user}\0{admin_pass}".encode("utf-8"))], manifest, report)
+    with span("feeds"):
+        build_feeds(recent, months, manifest, report)
+
+def load_state(session=None):
+    # Everything a build pass needs that is worth keeping between passes
+    with span("archive_load"):
+        archive = load_recent(RECENT_SIZE)
+    with span("dedup_index"):
+        dedup = load_dedup_index(archive)
+    with span("tag_index"):
+        tags, changed_tags = load_tag_index()
+    return {"session": session or make_session(), "archive": archive, "manifest": load_manifest(),
+            "dedup": dedup, "tags": tags, "changed_tags": changed_tags, "stamp": archive_stamp()}
+
+def archive_stamp():
+    # Changes when another run writes the newest partitions or the month turns over
+    return current_month(), [(m, file_stamp(partition_path(m))) for m in archive_months()[-2:]]
+
+def reload_if_stale(state):
+    # Another run may have changed the archive since this state was loaded
+    if state["stamp"] != archive_stamp():
+        print("Archive changed on disk, reloading")
+        state.update(load_state(state["session"]))
+
+def generate(state):
+    reload_if_stale(state)
+    archive, manifest = state["archive"], state["manifest"]
+    with span("fetch"):
+        headlines = fetch_news(state["session"])
+    count("headlines_fetched", len(headlines))
+    if upstream_unchanged():
+        print("Upstream headlines unchanged, skipping story generation")
+        headlines = []
+    report = new_report()
+    write_assets(report)
+    if manifest.get("articles") != TEMPLATE_VERSION:
+        print("Templates changed, rebuilding archived articles")
+        with span("rebuild_articles"):
+            rebuild_articles(archive_list(load_archive()), manifest, report)
+    with span("dedup"):
+        headlines, duplicates, signatures = dedupe_headlines(headlines, archive, state["dedup"])
+    count("duplicates_skipped", duplicates)
+    with span("images"):
+        images = process_images((a.get("image") for a in headlines), state["session"])
     new = []
+    stories = [{"headline": a["title"], "original_image": a.get("image"), "original_url": a.get("url"),
+                "images": images.get(a.get("image")), "slug": a["slug"]} for a in headlines]
+    with span("render"):
+        articles = make_articles(stories)
+    for story, art, source_data in zip(stories, articles, headlines):
+        entry = {"title": art["title"], "slug": art["slug"], "date": art["date"], "image": art["image"],
+                 "headline": story["headline"], "url": story["original_url"]}
+        if art["images"]:
+            entry["images"] = art["images"]
+        for field in ("category", "source", "published"):
+            if source_data.get(field):
+                entry[field] = source_data[field]
+        entry["month"] = month_of(entry)
+        new.append(entry)
     
-    for article_data in headlines:
-        headline = article_data["title"]
-        original_img = article_data.get("image")
-        original_url = article_data.get("url")
-        
-        art = make_article(headline, original_img, original_url)
-        new.append({"title": art["title"], "slug": art["slug"], "date": art["date"], "image": art["image"]})
-        with open(f"articles/{art['slug']}", "w") as f:
-            f.write(art["html"])
+    journal = begin_journal([a["slug"] for a in new], archive_paths(new))
+    for art in articles:
+        path = f"articles/{art['slug']}"
+        with span("write"):
+            record(report, path, write_if_changed(path, art["html"]))
         print(f"Created: {art['slug']}")
     
-    all_articles = new + archive
-    save_archive(all_articles)
+    count("stories_new", len(new))
+    with span("archive_save"):
+        upsert_archive(archive, new)
+        save_archive(new)
+        mark_archived(journal)
+        state["stamp"] = archive_stamp()
+        merge_dedup_index(state["dedup"], signatures)
+        save_dedup_index(state["dedup"])
+        changed_tags = state["changed_tags"] | add_tags(state["tags"], new)
+        save_tag_index(state["tags"])
+    with span("search"):
+        update_search_index(new, report)
     
-    with open("index.html", "w") as f:
-        f.write(make_homepage(all_articles))
-    with open("about.html", "w") as f:
-        f.write(make_about())
-    with open("contact.html", "w") as f:
-        f.write(make_contact())
-    with open("admin-config.js", "w") as f:
-        f.write(make_config())
+    with span("pages"):
+        build_pages(archive_list(archive), manifest, report, state["tags"], changed_tags)
+    prune_outputs(manifest, report)
+    with span("manifest_save"):
+        save_manifest(manifest)
+    state["changed_tags"] = set()
+    end_journal()
     
-    print(f"Done! {len(new)} new, {len(all_articles)} total")
+    count_report(report)
+    print_report(report)
+    if sum(HTTP_CACHE_STATS.values()):
+        print("HTTP cache: " + ", ".join(f"{k} {v}" for k, v in HTTP_CACHE_STATS.items()))
+    print(f"Done! {len(new)} new, {duplicates} duplicates skipped, {len(archive_months())} months")
+    return 0
+
+def main():
+    print("Starting...")
+    os.makedirs("articles", exist_ok=True)
+    return run_locked(lambda: instrumented("build", lambda: generate(load_state())))
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def refresh_pages(state):
+    reload_if_stale(state)
+    report = new_report()
+    build_pages(archive_list(state["archive"]), state["manifest"], report, state["tags"], state["changed_tags"])
+    save_manifest(state["manifest"])
+    print_report(report)
+
+def start_preview(port):
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=os.getcwd())
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Previewing at http://127.0.0.1:{port}/")
+
+def serve():
+    # Long-running mode: archive, templates, dedup index and HTTP session stay
+    # loaded, sources are polled every SERVE_INTERVAL seconds with jitter so
+    # several instances don't hit upstream together, and editing
+    # about_custom.txt re-renders the pages straight away
+    print("Serving...")
+    os.makedirs("articles", exist_ok=True)
+    state = run_locked(load_state)
+    if SERVE_PORT:
+        start_preview(SERVE_PORT)
+    about = file_stamp(ABOUT_CUSTOM)
+    next_poll = time.monotonic()
+    try:
+        while True:
+            if time.monotonic() >= next_poll:
+                try:
+                    run_locked(lambda: instrumented("build", lambda: generate(state)))
+                except Exception:
+                    # One bad pass shouldn't stop the daemon. It may have stopped
+                    # half way through updating the warm state, so a stale stamp
+                    # makes the next one reload it
+                    print("Build failed:")
+                    traceback.print_exc()
+                    state["stamp"] = None
+                delay = SERVE_INTERVAL * random.uniform(1 - SERVE_JITTER, 1 + SERVE_JITTER)
+                next_poll = time.monotonic() + delay
+                print(f"Next poll in {delay:.0f}s")
+            stamp = file_stamp(ABOUT_CUSTOM)
+            if stamp != about:
+                about = stamp
+                print(f"{ABOUT_CUSTOM} changed, rebuilding pages")
+                try:
+                    run_locked(lambda: refresh_pages(state))
+                except Exception:
+                    print("Refresh failed:")
+                    traceback.print_exc()
+                    state["stamp"] = None
+            time.sleep(max(0, min(1, next_poll - time.monotonic())))
+    except KeyboardInterrupt:
+        print("Stopped")
     return 0
 
+def rebuild():
+    # Re-render every archived article, e.g. after a template change
+    print("Rebuilding...")
+    os.makedirs("articles", exist_ok=True)
+    return run_locked(lambda: instrumented("rebuild", rebuild_site))
+
+def rebuild_site():
+    with span("archive_load"):
+        archive = load_archive()
+    manifest = load_manifest()
+    report = new_report()
+    images = process_images(e.get("image") for e in archive.values())
+    changed = [dict(e, images=images[e["image"]]) for e in archive.values()
+               if e.get("image") in images and e.get("images") != images[e["image"]]]
+    update_archive(archive, changed)
+    journal = begin_journal([], archive_paths(changed))
+    save_archive(changed, update=True)
+    mark_archived(journal)
+    entries = archive_list(archive)
+    write_assets(report)
+    with span("rebuild_articles"):
+        rebuild_articles(entries, manifest, report)
+    with span("search"):
+        build_search_index(archive, report)
+    tags = build_tag_index(archive)
+    write_tag_index(tags)
+    with span("pages"):
+        build_pages(entries, manifest, report, tags, set(tags["tags"]))
+    prune_outputs(manifest, report)
+    save_manifest(manifest)
+    end_journal()
+    count_report(report)
+    print_report(report)
+    print(f"Done! {len(entries)} articles")
+    return 0
+
+COMMANDS = {"build": main, "rebuild": rebuild, "serve": serve}
+
 if __name__ == "__main__":
-    sys.exit(main())
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command not in COMMANDS:
+        sys.exit(f"usage: python generate.py [{'|'.join(COMMANDS)}]")
+    sys.exit(COMMANDS[command]())
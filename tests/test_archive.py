@@ -0,0 +1,191 @@
+# Archive tests in a scratch directory; no network needed.
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+import generate
+
+def entry(slug, title, date="January 28, 2026 at 04:57 PM CST"):
+    return {"title": title, "slug": slug, "date": date, "image": "https://ex.com/a.jpg"}
+
+def touch(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x")
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.root)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def quietly(self, fn, *args):
+        with redirect_stdout(io.StringIO()) as out:
+            result = fn(*args)
+        return result, out.getvalue()
+
+class JournalTest(ArchiveTest):
+    def interrupted_run(self, archived):
+        # One story archived earlier, then a run that re-renders it, writes a
+        # new one and dies before end_journal()
+        old = entry("old.html", "OLD STORY")
+        generate.save_archive([old])
+        touch("articles/old.html")
+        path = generate.partition_path("2026-01")
+        size = os.path.getsize(path)
+        journal = generate.begin_journal(["old.html", "new.html"], [path])
+        for name in ("new.html", "new.html.gz", "old.html"):
+            touch(f"articles/{name}")
+        generate.save_archive([entry("new.html", "NEW STORY")])
+        if archived:
+            generate.mark_archived(journal)
+        for name in (generate.MANIFEST, f"{generate.SEARCH_DIR}/meta.json", generate.TAGS_INDEX):
+            touch(name)
+        return path, size
+
+    def assert_indexes_dropped(self):
+        for name in (generate.JOURNAL, generate.MANIFEST, f"{generate.SEARCH_DIR}/meta.json", generate.TAGS_INDEX):
+            self.assertFalse(os.path.exists(name), name)
+
+    def test_rollback_before_archive(self):
+        path, size = self.interrupted_run(archived=False)
+        _, out = self.quietly(generate.recover_journal)
+        self.assertIn("Rolling back", out)
+        self.assertEqual(os.path.getsize(path), size)
+        self.assertEqual(list(generate.read_archive_log(path)[0]), ["old.html"])
+        # The new story's files go, the archived one it re-rendered stays
+        self.assertEqual(sorted(os.listdir("articles")), ["old.html"])
+        self.assert_indexes_dropped()
+
+    def test_resume_after_archive(self):
+        path, size = self.interrupted_run(archived=True)
+        _, out = self.quietly(generate.recover_journal)
+        self.assertIn("Resuming", out)
+        self.assertGreater(os.path.getsize(path), size)
+        self.assertEqual(list(generate.read_archive_log(path)[0]), ["old.html", "new.html"])
+        self.assertEqual(sorted(os.listdir("articles")), ["new.html", "new.html.gz", "old.html"])
+        self.assert_indexes_dropped()
+
+    def test_no_journal_is_a_no_op(self):
+        touch(generate.MANIFEST)
+        _, out = self.quietly(generate.recover_journal)
+        self.assertEqual(out, "")
+        self.assertTrue(os.path.exists(generate.MANIFEST))
+
+MEASLES = "SOUTH CAROLINA MEASLES OUTBREAK IS LARGEST IN US SINCE MEASLES WAS DECLARED ELIMINATED - CNN - DEVELOPING"
+REWORDED = "South Carolina measles outbreak becomes largest in US since measles was eliminated - NBC"
+
+class DedupTest(ArchiveTest):
+    def setUp(self):
+        super().setUp()
+        self.saved = generate.DEDUP_INDEX
+        generate.DEDUP_INDEX = os.path.join(self.root, ".cache", "dedup.sqlite3")
+
+    def tearDown(self):
+        generate.DEDUP_INDEX = self.saved
+        super().tearDown()
+
+    def index(self, archive):
+        index, _ = self.quietly(generate.load_dedup_index, archive)
+        self.addCleanup(index["db"].close)
+        return index
+
+    def dedupe(self, titles, archive, index):
+        (kept, skipped, run), out = self.quietly(generate.dedupe_headlines, [{"title": t} for t in titles], archive, index)
+        return kept, skipped, run, out
+
+    def test_rewording_of_a_stored_story_is_skipped(self):
+        generate.save_archive([entry("south-carolina-measles-outbreak-is-largest-in-us-s.html", MEASLES)])
+        self.index({})["db"].close()
+        # A later run whose recent months no longer hold the story still finds it on disk
+        index = self.index({})
+        self.assertEqual(index["signatures"], {})
+        kept, skipped, _, out = self.dedupe([REWORDED, "Goose sues bakery over stale bread"], {}, index)
+        self.assertEqual([a["title"] for a in kept], ["Goose sues bakery over stale bread"])
+        self.assertEqual(skipped, 1)
+        self.assertIn("~ south-carolina-measles-outbreak-is-largest-in-us-s.html", out)
+
+    def test_rewording_within_a_run_is_skipped(self):
+        index = self.index({})
+        kept, skipped, run, _ = self.dedupe([MEASLES, REWORDED], {}, index)
+        self.assertEqual([a["title"] for a in kept], [MEASLES])
+        self.assertEqual(skipped, 1)
+        # Once merged and saved, the next run skips it against the database
+        generate.merge_dedup_index(index, run)
+        generate.save_dedup_index(index)
+        kept, skipped, _, _ = self.dedupe([REWORDED], {}, index)
+        self.assertEqual((kept, skipped), ([], 1))
+
+    def test_slug_collision_gets_a_suffix(self):
+        # Same first 50 slug characters, different stories
+        first = "Local man wins the regional pie eating championship again for the third year running"
+        second = "Local man wins the regional pie eating championship again after a goose steals his fork"
+        slug = generate.make_slug(first) + ".html"
+        self.assertEqual(slug, generate.make_slug(second) + ".html")
+        touch(f"articles/{slug}")
+        kept, _, _, out = self.dedupe([second], {}, self.index({}))
+        self.assertNotEqual(kept[0]["slug"], slug)
+        self.assertRegex(kept[0]["slug"], r"^[a-z0-9-]+-[0-9a-f]{6}\.html$")
+        self.assertLessEqual(len(kept[0]["slug"]), 50 + len(".html"))
+        self.assertIn("Slug collision", out)
+        # The suffix is derived from the headline, so it is stable and grows when taken
+        again = generate.unique_slug(second, lambda s: s in (slug, kept[0]["slug"]))
+        self.assertEqual(again, generate.unique_slug(second, lambda s: s in (slug, kept[0]["slug"])))
+        self.assertNotIn(again, (slug, kept[0]["slug"]))
+        self.assertRegex(again, r"-[0-9a-f]{7}\.html$")
+
+class MigrationTest(ArchiveTest):
+    def test_legacy_archive_json(self):
+        # The list the site shipped with: newest first, one slug per render
+        shutil.copy(os.path.join(REPO, "archive.json"), generate.LEGACY_ARCHIVE)
+        with open(generate.LEGACY_ARCHIVE) as f:
+            legacy = json.load(f)
+        newest = {}
+        for item in legacy:
+            newest.setdefault(item["slug"], item)
+        _, out = self.quietly(generate.migrate_archive)
+        self.assertEqual(out, "Migrated archive.json: 694 entries, 496 unique, 1 months\n")
+        self.assertFalse(os.path.exists(generate.LEGACY_ARCHIVE))
+        self.assertEqual(generate.archive_months(), ["2026-01"])
+        archive = generate.load_archive()
+        # One entry per slug, the newest render of each, newest first
+        self.assertEqual([e["slug"] for e in generate.archive_list(archive)], list(newest))
+        for slug, item in newest.items():
+            self.assertEqual(archive[slug], dict(item, month="2026-01"))
+        # Already migrated
+        _, out = self.quietly(generate.migrate_archive)
+        self.assertEqual(out, "")
+
+    def test_legacy_log_splits_by_month(self):
+        lines = [entry("a.html", "A - V1", "November 30, 2025 at 11:00 PM CST"),
+                 entry("b.html", "B", "December 02, 2025 at 09:00 AM CST"),
+                 entry("a.html", "A - V2", "December 03, 2025 at 10:00 AM CST"),
+                 dict(entry("b.html", "B - FIXED", "December 02, 2025 at 09:00 AM CST"), _update=True),
+                 dict(entry("c.html", "UNDATED"), date="")]
+        with open(generate.LEGACY_LOG, "w") as f:
+            f.write("".join(json.dumps(line) + "\n" for line in lines))
+        _, out = self.quietly(generate.migrate_archive)
+        self.assertIn("Migrated archive.jsonl: 5 entries, 3 unique", out)
+        months = {month: list(generate.read_archive_log(generate.partition_path(month))[0])
+                  for month in generate.archive_months()}
+        self.assertEqual(months.pop("2025-12"), ["b.html", "a.html"])
+        # Undated stories go to the month they were migrated in
+        self.assertEqual(months, {generate.current_month(): ["c.html"]})
+        archive = generate.load_archive()
+        self.assertEqual(archive["a.html"]["title"], "A - V2")
+        self.assertEqual(archive["b.html"]["title"], "B - FIXED")
+        self.assertEqual(archive["c.html"]["month"], generate.current_month())
+
+if __name__ == "__main__":
+    unittest.main()
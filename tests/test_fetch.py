@@ -0,0 +1,122 @@
+# Fetcher tests against a scripted HTTP server on localhost; no network needed.
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate
+import requests
+
+def rss(*titles):
+    items = "".join(f"<item><title>{t}</title><link>https://example.com/{n}</link></item>"
+                    for n, t in enumerate(titles))
+    return f"<rss><channel><title>Test Feed</title>{items}</channel></rss>".encode("utf-8")
+
+class Handler(BaseHTTPRequestHandler):
+    # server.routes maps a path to a list of (status, body, delay); each request
+    # takes the next one and the last repeats
+    def do_GET(self):
+        script = self.server.routes.get(self.path, [(404, b"", 0)])
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        status, body, delay = script[min(self.server.hits[self.path], len(script)) - 1]
+        if delay:
+            time.sleep(delay)
+        try:
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+class FetchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.server.routes = {}
+        self.server.hits = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cache = tempfile.mkdtemp()
+        self.saved = {name: getattr(generate, name) for name in
+                      ("API_KEY", "NEWS_FEEDS", "NEWS_FIXTURE", "HTTP_CACHE_DIR", "HTTP_CACHE_TTL",
+                       "FETCH_BACKOFF", "FETCH_DEADLINE", "FETCH_TIMEOUT")}
+        generate.API_KEY = ""
+        generate.NEWS_FIXTURE = ""
+        generate.HTTP_CACHE_DIR = self.cache
+        generate.HTTP_CACHE_TTL = 0
+        generate.FETCH_BACKOFF = 0.05
+        self.session = generate.make_session()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        for name, value in self.saved.items():
+            setattr(generate, name, value)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def fetch(self, *paths):
+        generate.NEWS_FEEDS = ",".join(self.url(p) for p in paths)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            merged = generate.fetch_all(self.session)
+        return merged, out.getvalue()
+
+    def test_retries_5xx_and_429_with_backoff(self):
+        self.server.routes["/flaky"] = [(503, b"", 0), (429, b"", 0), (200, rss("Cat Elected Mayor"), 0)]
+        start = time.monotonic()
+        merged, out = self.fetch("/flaky")
+        self.assertEqual([a["title"] for a in merged], ["Cat Elected Mayor"])
+        self.assertEqual(self.server.hits["/flaky"], 3)
+        # Two waits: FETCH_BACKOFF, then twice that
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(out, "")
+
+    def test_gives_up_after_retries(self):
+        self.server.routes["/down"] = [(500, b"", 0)]
+        deadline = time.monotonic() + 10
+        with self.assertRaises(requests.HTTPError):
+            generate.get_with_retries(self.session, self.url("/down"), deadline)
+        self.assertEqual(self.server.hits["/down"], generate.FETCH_RETRIES + 1)
+
+    def test_deadline_bounds_slow_sources(self):
+        generate.FETCH_DEADLINE = 0.5
+        self.server.routes["/slow"] = [(200, rss("Too Late"), 1.5)]
+        self.server.routes["/fast"] = [(200, rss("Man Wins Lottery"), 0)]
+        start = time.monotonic()
+        merged, out = self.fetch("/slow", "/fast")
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual([a["title"] for a in merged], ["Man Wins Lottery"])
+        self.assertIn(f"Source feed:{self.url('/slow')}", out)
+
+    def test_reports_each_failed_source(self):
+        self.server.routes["/missing"] = [(404, b"", 0)]
+        self.server.routes["/garbage"] = [(200, b"<rss><channel>", 0)]
+        self.server.routes["/good"] = [(200, rss("Goose Sues Bakery"), 0)]
+        merged, out = self.fetch("/missing", "/garbage", "/good")
+        self.assertEqual([a["title"] for a in merged], ["Goose Sues Bakery"])
+        self.assertIn(f"Source feed:{self.url('/missing')} failed", out)
+        self.assertIn(f"Source feed:{self.url('/garbage')} failed", out)
+        self.assertNotIn(self.url("/good"), out)
+
+    def test_merge_round_robin_and_dedup(self):
+        first = [{"title": t} for t in ("A one", "A two", "A three")]
+        second = [{"title": t} for t in ("B one", " a TWO ")]
+        merged = generate.merge_headlines([first, second])
+        self.assertEqual([a["title"] for a in merged], ["A one", "B one", "A two", "A three"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# Image stage tests, reading originals from IMAGE_FIXTURE_DIR instead of the network.
+import io
+import os
+import re
+import sys
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate
+
+@unittest.skipIf(generate.Image is None, "needs Pillow")
+class ImageTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.root)
+        self.saved = {name: getattr(generate, name) for name in
+                      ("IMAGE_STAGE", "IMAGE_FIXTURE_DIR", "IMAGE_CACHE_DIR")}
+        generate.IMAGE_STAGE = True
+        generate.IMAGE_FIXTURE_DIR = os.path.join(self.root, "fixtures")
+        generate.IMAGE_CACHE_DIR = os.path.join(self.root, ".cache", "images")
+        os.makedirs(generate.IMAGE_FIXTURE_DIR)
+        for name, size in (("wide.png", (2000, 1000)), ("mid.png", (800, 400)), ("narrow.png", (300, 200))):
+            generate.Image.new("RGB", size, (200, 0, 0)).save(os.path.join(generate.IMAGE_FIXTURE_DIR, name))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root, ignore_errors=True)
+        for name, value in self.saved.items():
+            setattr(generate, name, value)
+
+    def process(self, *urls):
+        with redirect_stdout(io.StringIO()) as out:
+            results = generate.process_images(urls)
+        return results, out.getvalue()
+
+    def test_sizes_follow_the_source(self):
+        urls = [f"https://ex.com/img/{n}.png" for n in ("wide", "mid", "narrow")]
+        results, out = self.process(*urls)
+        self.assertIn("3 of 3 ready", out)
+        widths = {url.rsplit("/", 1)[1]: (r["thumb"]["width"], r["full"]["width"]) for url, r in results.items()}
+        self.assertEqual(widths, {"wide.png": (480, 1200), "mid.png": (480, 800), "narrow.png": (300, 300)})
+        for derived in results.values():
+            for d in derived.values():
+                self.assertTrue(os.path.exists(d["src"]))
+        # A source narrower than the thumbnail is written once and used for both
+        narrow = results["https://ex.com/img/narrow.png"]
+        self.assertEqual(narrow["thumb"]["src"], narrow["full"]["src"])
+        self.assertEqual(len(os.listdir(generate.IMAGES_DIR)), 5)
+
+    def test_srcset_has_no_duplicate_widths(self):
+        results, _ = self.process("https://ex.com/img/narrow.png", "https://ex.com/img/wide.png")
+        narrow = generate.image_attrs(results["https://ex.com/img/narrow.png"], "", True)
+        self.assertEqual(re.findall(r"(\d+)w\b", narrow), ["300"])
+        wide = generate.image_attrs(results["https://ex.com/img/wide.png"], "../", False)
+        self.assertEqual(re.findall(r"(\d+)w\b", wide), ["480", "1200"])
+        self.assertIn('width="1200" height="600"', wide)
+
+    def test_cached_originals_are_reused(self):
+        url = "https://ex.com/img/mid.png"
+        first, _ = self.process(url)
+        os.remove(os.path.join(generate.IMAGE_FIXTURE_DIR, "mid.png"))
+        second, out = self.process(url)
+        self.assertEqual(first, second)
+        self.assertIn("1 of 1 ready", out)
+
+    def test_missing_fixture_is_skipped(self):
+        results, out = self.process("https://ex.com/img/absent.png")
+        self.assertEqual(results, {})
+        self.assertIn("0 of 1 ready, 1 skipped", out)
+
+if __name__ == "__main__":
+    unittest.main()